@@ -0,0 +1,72 @@
+"""Preallocated capture buffer for microphone recordings"""
+
+import io
+
+import numpy as np
+
+
+class RecordingBuffer:
+    """Growable float32 buffer that the sounddevice callback writes into.
+
+    Each block is copied straight into preallocated storage, so a recording
+    costs one copy per block instead of a list of block copies plus a final
+    concatenate. Capacity doubles when a recording outgrows it and is kept
+    for the next recording, so steady-state dictation never allocates.
+    """
+
+    def __init__(self, sample_rate: int, initial_seconds: int = 60):
+        self._data = np.empty(sample_rate * initial_seconds, dtype=np.float32)
+        self._length = 0
+
+    def __len__(self) -> int:
+        return self._length
+
+    def reset(self):
+        self._length = 0
+
+    def write(self, indata: np.ndarray):
+        """Append one (frames, channels) block, keeping the first channel."""
+        frames = len(indata)
+        end = self._length + frames
+        if end > len(self._data):
+            grown = np.empty(max(end, 2 * len(self._data)), dtype=np.float32)
+            grown[:self._length] = self._data[:self._length]
+            self._data = grown
+        self._data[self._length:end] = indata[:, 0]
+        self._length = end
+
+    def view(self) -> np.ndarray:
+        """The recorded samples, without copying.
+
+        Valid until the next reset(); the listener handles a key release to
+        completion before it processes the next key press, so a view handed
+        to the transport is never overwritten while it is being sent.
+        """
+        return self._data[:self._length]
+
+
+class BufferReader(io.RawIOBase):
+    """Read-only file object over an array, so requests streams it as the body.
+
+    requests sends file objects in fixed-size blocks with a Content-Length
+    taken from len(), instead of needing the whole body as one bytes copy.
+    """
+
+    def __init__(self, array: np.ndarray):
+        self._view = memoryview(np.ascontiguousarray(array)).cast("B")
+        self._position = 0
+
+    def __len__(self) -> int:
+        return len(self._view)
+
+    def readable(self) -> bool:
+        return True
+
+    def tell(self) -> int:
+        return self._position
+
+    def readinto(self, buffer) -> int:
+        count = min(len(buffer), len(self._view) - self._position)
+        buffer[:count] = self._view[self._position:self._position + count]
+        self._position += count
+        return count
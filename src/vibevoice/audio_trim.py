@@ -0,0 +1,119 @@
+"""Energy-based silence trimming for recordings before they are uploaded"""
+
+from collections import deque
+
+import numpy as np
+
+FRAME_MS = 20
+PAD_MS = 200  # Silence kept around speech so word onsets and endings survive
+MAX_PAUSE_MS = 800  # Longer internal pauses are shortened to this
+MIN_LEVEL = 0.002  # RMS below this is always silence (about -54 dBFS)
+NOISE_RATIO = 3.0  # Speech must be this much louder than the noise floor
+
+
+def _frame_levels(audio: np.ndarray, frame: int) -> np.ndarray:
+    """RMS level of each complete frame."""
+    frames = audio[:len(audio) // frame * frame].reshape(-1, frame)
+    return np.sqrt(np.einsum("ij,ij->i", frames, frames) / frame)
+
+
+def trim_silence(audio: np.ndarray, sample_rate: int = 16000,
+                 pad_ms: int = PAD_MS, max_pause_ms: int = MAX_PAUSE_MS):
+    """Drop leading/trailing silence and shorten long pauses.
+
+    Speech frames are those louder than both MIN_LEVEL and NOISE_RATIO times
+    the recording's noise floor (its 10th percentile frame level). Returns
+    (trimmed_audio, stats). When only the head and tail are cut, the result
+    is a view of `audio`, not a copy. An empty result means no speech at all.
+    """
+    audio = audio.reshape(-1)
+    frame = sample_rate * FRAME_MS // 1000
+    original_seconds = len(audio) / sample_rate
+    levels = _frame_levels(audio, frame)
+
+    if len(levels) == 0:
+        return audio, {"original_seconds": original_seconds, "removed_seconds": 0.0}
+
+    noise_floor = np.percentile(levels, 10)
+    # Cap the threshold so a recording that is speech throughout keeps its quieter words.
+    threshold = max(MIN_LEVEL, min(noise_floor * NOISE_RATIO, levels.max() * 0.25))
+    speech = levels > threshold
+
+    if not speech.any():
+        return audio[:0], {"original_seconds": original_seconds, "removed_seconds": original_seconds}
+
+    pad_frames = pad_ms // FRAME_MS
+    max_pause_frames = max(max_pause_ms // FRAME_MS, 2 * pad_frames)
+    speech_frames = np.flatnonzero(speech)
+    first = max(speech_frames[0] - pad_frames, 0)
+    last = min(speech_frames[-1] + pad_frames + 1, len(levels))
+
+    # Pauses between consecutive speech frames that are longer than allowed.
+    gaps = np.diff(speech_frames) - 1
+    long_gaps = np.flatnonzero(gaps > max_pause_frames)
+
+    if len(long_gaps) == 0:
+        end = len(audio) if last == len(levels) else last * frame
+        trimmed = audio[first * frame:end]
+    else:
+        # Keep half of the allowed pause on either side of each long gap.
+        keep = max_pause_frames // 2
+        spans = []
+        start = first
+        for gap in long_gaps:
+            spans.append((start, speech_frames[gap] + 1 + keep))
+            start = speech_frames[gap + 1] - keep
+        spans.append((start, last))
+        trimmed = np.concatenate([audio[a * frame:b * frame] for a, b in spans])
+
+    return trimmed, {
+        "original_seconds": original_seconds,
+        "removed_seconds": original_seconds - len(trimmed) / sample_rate,
+    }
+
+
+class LeadingSilenceGate:
+    """Hold back live audio until speech starts, keeping pad_ms before it.
+
+    The streaming counterpart of trim_silence's head cut. Each 20 ms frame
+    is compared with MIN_LEVEL and NOISE_RATIO times the noise floor of the
+    silence so far, as the rest of the recording is not known yet; the first
+    WARMUP_MS only measure that floor. Once a frame is speech, everything
+    from then on passes through unchanged. A gate that never opened (`open`
+    is False) may still have missed speech that started right away, so the
+    caller should judge the whole recording with trim_silence instead.
+    """
+
+    WARMUP_MS = 100
+
+    def __init__(self, sample_rate: int = 16000, pad_ms: int = PAD_MS):
+        self.sample_rate = sample_rate
+        self.frame = sample_rate * FRAME_MS // 1000
+        self._held = deque(maxlen=max(pad_ms, self.WARMUP_MS) // FRAME_MS)
+        self._noise = deque(maxlen=1000 // FRAME_MS)
+        self._partial = np.zeros(0, dtype=np.float32)
+        self.open = False
+        self.removed_samples = 0
+
+    @property
+    def removed_seconds(self) -> float:
+        return self.removed_samples / self.sample_rate
+
+    def feed(self, samples: np.ndarray) -> np.ndarray:
+        """Return the samples to send now; empty while the recording is still silent."""
+        if self.open:
+            return samples.reshape(-1)
+        audio = np.concatenate([self._partial, samples.reshape(-1)])
+        count = len(audio) // self.frame
+        self._partial = audio[count * self.frame:]
+        levels = _frame_levels(audio, self.frame)
+        for index, level in enumerate(levels):
+            warm = len(self._noise) >= self.WARMUP_MS // FRAME_MS
+            if warm and level > max(MIN_LEVEL, np.percentile(self._noise, 10) * NOISE_RATIO):
+                self.open = True
+                return np.concatenate([*self._held, audio[index * self.frame:]])
+            if len(self._held) == self._held.maxlen:
+                self.removed_samples += self.frame
+            self._held.append(audio[index * self.frame:(index + 1) * self.frame])
+            self._noise.append(level)
+        return audio[:0]
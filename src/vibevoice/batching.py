@@ -0,0 +1,74 @@
+"""Dynamic micro-batching of concurrent transcription requests"""
+
+import asyncio
+import time
+
+from metrics import BATCH_SIZE_BUCKETS, LATENCY_BUCKETS, Histogram
+
+
+class BatchScheduler:
+    """Group requests with the same batch key that arrive within a short window.
+
+    The first request for a key opens a window of `window_seconds`. Requests
+    with the same key that arrive before it closes join the batch, and the
+    batch is flushed early once it reaches `max_batch_size`. `run_batch` is
+    awaited with the list of queued items and must return one result per item.
+    All bookkeeping happens on the event loop, so no locking is needed.
+    """
+
+    def __init__(self, run_batch, window_seconds: float, max_batch_size: int):
+        self.run_batch = run_batch
+        self.window_seconds = window_seconds
+        self.max_batch_size = max(1, max_batch_size)
+        self.batch_sizes = Histogram(BATCH_SIZE_BUCKETS)
+        self.latency = Histogram(LATENCY_BUCKETS)
+        self._pending = {}
+        self._timers = {}
+
+    async def submit(self, batch_key, item):
+        """Queue an item for batching and await its individual result."""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        batch = self._pending.setdefault(batch_key, [])
+        batch.append((item, future, time.perf_counter()))
+
+        if len(batch) >= self.max_batch_size:
+            self._flush(batch_key)
+        elif len(batch) == 1:
+            self._timers[batch_key] = loop.call_later(self.window_seconds, self._flush, batch_key)
+
+        return await future
+
+    def _flush(self, batch_key):
+        timer = self._timers.pop(batch_key, None)
+        if timer is not None:
+            timer.cancel()
+        batch = self._pending.pop(batch_key, None)
+        if batch:
+            asyncio.ensure_future(self._run(batch))
+
+    async def _run(self, batch):
+        self.batch_sizes.observe(len(batch))
+        try:
+            results = await self.run_batch([item for item, _, _ in batch])
+        except Exception as e:
+            for _, future, _ in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        finished = time.perf_counter()
+        for (_, future, queued_at), result in zip(batch, results):
+            self.latency.observe(finished - queued_at)
+            if not future.done():
+                future.set_result(result)
+
+    def stats(self) -> dict:
+        return {
+            "enabled": True,
+            "window_ms": int(self.window_seconds * 1000),
+            "max_batch_size": self.max_batch_size,
+            "open_batches": len(self._pending),
+            "batch_size": self.batch_sizes.snapshot(),
+            "latency_seconds": self.latency.snapshot(),
+        }
@@ -0,0 +1,440 @@
+"""Benchmark the dictation pipeline on a corpus of WAV files
+
+    vibevoice bench corpus/ --compute-type int8 --compute-type int8_float32 --clients 1,4
+    vibevoice bench corpus/ --server      # against the running vibevoice server
+    vibevoice bench corpus/ --stub        # pipeline overhead only, no model download
+
+Each model/compute_type pair runs in its own subprocess so its peak RSS is
+measured in isolation. Results are printed as JSON; --compare fails the run
+when p95 latency or real-time factor regressed against an earlier result.
+"""
+
+import argparse
+import asyncio
+import contextlib
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import types
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from scipy.io import wavfile
+
+from transcription_client import (
+    SAMPLE_RATE,
+    RequestTrace,
+    english_params,
+    send_recording,
+    swedish_params,
+    trim_recording,
+)
+
+PARAMS = {"en": english_params, "sv": swedish_params}
+
+
+def load_corpus(paths):
+    """Read WAV files (or directories of them) as 16 kHz mono float32 arrays."""
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            files.extend(sorted(
+                os.path.join(path, name) for name in os.listdir(path) if name.lower().endswith(".wav")
+            ))
+        else:
+            files.append(path)
+
+    corpus = []
+    for path in files:
+        rate, data = wavfile.read(path)
+        if data.ndim > 1:
+            data = data.mean(axis=1)
+        if np.issubdtype(data.dtype, np.integer):
+            data = data.astype(np.float32) / np.iinfo(data.dtype).max
+        data = data.astype(np.float32)
+        if rate != SAMPLE_RATE:
+            positions = np.arange(0, len(data), rate / SAMPLE_RATE)
+            data = np.interp(positions, np.arange(len(data)), data).astype(np.float32)
+        corpus.append((os.path.basename(path), data))
+    if not corpus:
+        raise SystemExit("No WAV files found in the corpus")
+    return corpus
+
+
+def _percentiles(values):
+    if not values:
+        return None
+    p50, p95, p99 = np.percentile(values, [50, 95, 99])
+    return {
+        "p50": round(float(p50), 4),
+        "p95": round(float(p95), 4),
+        "p99": round(float(p99), 4),
+        "mean": round(float(np.mean(values)), 4),
+        "max": round(float(np.max(values)), 4),
+    }
+
+
+def run_load(send_one, corpus, clients, repeat):
+    """Replay the corpus `repeat` times from `clients` concurrent clients.
+
+    send_one(audio) must block until the transcript is back and return the
+    server's response dict (or None for a clip without speech).
+    """
+    jobs = [audio for _ in range(repeat) for _, audio in corpus]
+
+    def run(audio):
+        started = time.perf_counter()
+        try:
+            response = send_one(audio)
+        except Exception as e:
+            return {"error": str(e)}
+        latency = time.perf_counter() - started
+        timings = (response or {}).get("timings") or {}
+        audio_seconds = timings.get("audio_seconds") or len(audio) / SAMPLE_RATE
+        return {
+            "error": None,
+            "latency": latency,
+            "audio_seconds": audio_seconds,
+            "rtf": timings.get("real_time_factor"),
+            "cached": timings.get("cached", False),
+        }
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=clients) as pool:
+        results = list(pool.map(run, jobs))
+    wall_seconds = time.perf_counter() - started
+
+    done = [result for result in results if result["error"] is None]
+    audio_seconds = sum(result["audio_seconds"] for result in done)
+    errors = [result["error"] for result in results if result["error"] is not None]
+    return {
+        "clients": clients,
+        "requests": len(results),
+        "errors": len(errors),
+        "first_error": errors[0] if errors else None,
+        "cached": sum(1 for result in done if result["cached"]),
+        "wall_seconds": round(wall_seconds, 3),
+        "audio_seconds": round(audio_seconds, 3),
+        "latency_seconds": _percentiles([result["latency"] for result in done]),
+        # Server inference seconds per second of audio, excluding queue wait.
+        "real_time_factor": _percentiles([result["rtf"] for result in done if result["rtf"] is not None]),
+        "throughput": {
+            "requests_per_second": round(len(done) / wall_seconds, 3) if wall_seconds else None,
+            "audio_seconds_per_second": round(audio_seconds / wall_seconds, 3) if wall_seconds else None,
+        },
+    }
+
+
+class _StubFeatureExtractor:
+    """Passes audio through, with the attributes faster-whisper reads off a FeatureExtractor."""
+
+    sampling_rate = SAMPLE_RATE
+    chunk_length = 30
+    hop_length = 160
+    n_samples = chunk_length * SAMPLE_RATE
+    time_per_frame = hop_length / SAMPLE_RATE
+
+    def __call__(self, audio, **kwargs):
+        return audio
+
+
+class StubWhisperModel:
+    """Stand-in for WhisperModel that spends a fixed time per second of audio.
+
+    Runs everything around the model (trimming, queueing, caching and timing)
+    without downloading or loading Whisper weights. Batched decodes need
+    StubBatchedPipeline as well, as the real one needs Whisper's tokenizer.
+    """
+
+    seconds_per_audio_second = 0.05
+
+    def __init__(self, model_size_or_path, device="cpu", compute_type="default", **kwargs):
+        if device != "cpu":
+            raise RuntimeError("the stub model only runs on CPU")
+        self.model_size_or_path = model_size_or_path
+        self.feature_extractor = _StubFeatureExtractor()
+        self.model = types.SimpleNamespace(
+            generate=lambda seconds, **kwargs: time.sleep(seconds),
+            unload_model=lambda: None,
+        )
+
+    def encode(self, features):
+        return features
+
+    def transcribe(self, audio, **kwargs):
+        if isinstance(audio, str):
+            from faster_whisper import decode_audio
+            audio = decode_audio(audio, sampling_rate=SAMPLE_RATE)
+        duration = len(audio) / SAMPLE_RATE
+        self.encode(self.feature_extractor(audio))
+        self.model.generate(duration * self.seconds_per_audio_second, sampling_temperature=0.0)
+        segment = types.SimpleNamespace(
+            start=0.0, end=duration, text=f"stub transcript of {duration:.2f} seconds",
+            avg_logprob=-0.1, temperature=0.0, words=None,
+        )
+        return iter([segment]), types.SimpleNamespace(duration=duration, language=kwargs.get("language"))
+
+    def detect_language(self, audio=None, **kwargs):
+        self.encode(self.feature_extractor(audio))
+        return "en", 1.0, [("en", 1.0)]
+
+
+class StubBatchedPipeline:
+    """Stand-in for BatchedInferencePipeline over a StubWhisperModel.
+
+    Each batch of clips costs as long as its longest clip, as the clips of a
+    batch are decoded side by side.
+    """
+
+    def __init__(self, model):
+        self.model = model
+
+    def transcribe(self, audio, language=None, clip_timestamps=None, batch_size=8, **kwargs):
+        sampling_rate = self.model.feature_extractor.sampling_rate
+        duration = len(audio) / sampling_rate
+        clips = clip_timestamps or [{"start": 0, "end": len(audio)}]
+        segments = []
+        for index in range(0, len(clips), batch_size):
+            batch = clips[index:index + batch_size]
+            for clip in batch:
+                self.model.encode(self.model.feature_extractor(audio[clip["start"]:clip["end"]]))
+            longest = max(clip["end"] - clip["start"] for clip in batch) / sampling_rate
+            self.model.model.generate(longest * self.model.seconds_per_audio_second, sampling_temperature=0.0)
+            segments.extend(
+                types.SimpleNamespace(
+                    start=clip["start"] / sampling_rate, end=clip["end"] / sampling_rate,
+                    text=f"stub transcript of {(clip['end'] - clip['start']) / sampling_rate:.2f} seconds",
+                    avg_logprob=-0.1, temperature=0.0, words=None,
+                )
+                for clip in batch
+            )
+        return iter(segments), types.SimpleNamespace(duration=duration, language=language)
+
+
+def _peak_rss_mb(pid=None):
+    """Peak resident set size of this process, or of `pid` from /proc."""
+    if pid is None:
+        return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024)
+    try:
+        with open(f"/proc/{pid}/status") as status:
+            for line in status:
+                if line.startswith("VmHWM:"):
+                    return round(int(line.split()[1]) / 1024)
+    except OSError:
+        pass
+    return None
+
+
+def _worker(config):
+    """Benchmark one model/compute_type in this process, running the server code in-process."""
+    import server
+
+    if config["stub"]:
+        StubWhisperModel.seconds_per_audio_second = config["stub_rtf"]
+        server.WhisperModel = StubWhisperModel
+        server.BatchedInferencePipeline = StubBatchedPipeline
+
+    params = PARAMS[config["language"]]()
+    corpus = load_corpus(config["corpus"])
+
+    loop = asyncio.new_event_loop()
+    threading.Thread(target=loop.run_forever, daemon=True).start()
+
+    started = time.perf_counter()
+    model_instance = server.get_model_for_language(params["language"])
+    load_seconds = time.perf_counter() - started
+    key = server.model_key(model_instance)
+
+    def send_one(audio):
+        # The same trimming and request options as a dictation recording.
+        audio = trim_recording(audio)
+        if audio is None:
+            return None
+        request = server.TranscribeRequest(**params)
+        timings = server.RequestTimings(RequestTrace().request_id)
+        timings.audio_seconds = len(audio) / SAMPLE_RATE
+        result = asyncio.run_coroutine_threadsafe(server._transcribe(request, audio, timings), loop).result()
+        return {**result, "timings": timings.as_dict()}
+
+    for _ in range(config["warmup"]):
+        send_one(corpus[0][1])
+
+    runs = [run_load(send_one, corpus, clients, config["repeat"]) for clients in config["clients"]]
+    model_stats = next((model for model in server.model_cache.stats()["models"]
+                        if (model["model"], model["device"], model["compute_type"]) == key), {})
+    return {
+        "model": key[0],
+        "device": key[1],
+        "compute_type": key[2],
+        "requested_compute_type": config["compute_type"],
+        "stub": config["stub"],
+        "load_seconds": round(load_seconds, 2),
+        "model_rss_mb": model_stats.get("size_mb"),
+        "peak_rss_mb": _peak_rss_mb(),
+        "runs": runs,
+    }
+
+
+def _run_config(config):
+    """Run _worker for one configuration in a fresh subprocess and return its result."""
+    env = dict(os.environ, TRANSCRIPT_CACHE_SIZE="0", WHISPER_MODEL_SWEDISH=config["model"])
+    if config["device"] == "cpu":
+        # Without a visible GPU the server's CUDA attempt fails fast and it uses the CPU settings.
+        env.update(CUDA_VISIBLE_DEVICES="", WHISPER_SIZE_CPU=config["model"],
+                   WHISPER_COMPUTE_CPU=config["compute_type"])
+    else:
+        env.update(WHISPER_SIZE_GPU=config["model"], WHISPER_COMPUTE_GPU=config["compute_type"])
+
+    with tempfile.NamedTemporaryFile(suffix=".json") as result_file:
+        worker = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), "--worker", json.dumps(config), result_file.name],
+            env=env, stdout=sys.stderr,
+        )
+        result_file.seek(0)
+        data = result_file.read()
+    if worker.returncode != 0 or not data:
+        return {"model": config["model"], "compute_type": config["compute_type"],
+                "error": f"benchmark worker exited with status {worker.returncode}"}
+    return json.loads(data)
+
+
+def _bench_server(args, corpus):
+    """Benchmark the running server through the same HTTP path as the CLI."""
+    from http_client import SERVER_URL, session
+    from server_runtime import find_running_server
+
+    server = find_running_server()
+    if server is None:
+        raise SystemExit("No vibevoice server is running; start one or drop --server")
+    status = session.get(f"{SERVER_URL}/status", timeout=5).json()
+    params = PARAMS[args.language]()
+
+    def send_one(audio):
+        return send_recording(params, audio, RequestTrace())
+
+    for _ in range(args.warmup):
+        send_one(corpus[0][1])
+    runs = [run_load(send_one, corpus, clients, args.repeat) for clients in args.clients]
+    return {
+        "model": status["whisper"]["size"],
+        "device": status["whisper"]["backend"],
+        "compute_type": status["whisper"]["compute_type"],
+        "server_pid": server.get("pid"),
+        "peak_rss_mb": _peak_rss_mb(server.get("pid")),
+        "runs": runs,
+    }
+
+
+def compare(results, baseline, tolerance):
+    """Return the regressions of `results` against an earlier benchmark result."""
+    def index(data):
+        entries = {}
+        for config in data["configs"]:
+            for run in config.get("runs", []):
+                entries[(config["model"], config["compute_type"], run["clients"])] = run
+        return entries
+
+    previous = index(baseline)
+    regressions = []
+    for key, run in index(results).items():
+        before = previous.get(key)
+        if before is None:
+            continue
+        for metric in ("latency_seconds", "real_time_factor"):
+            old = (before.get(metric) or {}).get("p95")
+            new = (run.get(metric) or {}).get("p95")
+            if old and new and new > old * (1 + tolerance):
+                regressions.append(
+                    f"{key[0]} ({key[1]}, {key[2]} clients): {metric} p95 {old} -> {new}"
+                )
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="vibevoice bench", description="Benchmark the dictation pipeline.")
+    parser.add_argument("corpus", nargs="+", help="WAV files or directories of WAV files")
+    parser.add_argument("--language", choices=sorted(PARAMS), default="en",
+                        help="replay with the English (Ctrl) or Swedish (Num Lock) request options")
+    parser.add_argument("--model", action="append",
+                        help="model to benchmark, repeatable (default: $WHISPER_SIZE_CPU)")
+    parser.add_argument("--compute-type", action="append",
+                        help="compute type, repeatable, e.g. int8, int8_float32, float16 "
+                             "(default: $WHISPER_COMPUTE_CPU)")
+    parser.add_argument("--device", choices=("cpu", "cuda"), default="cpu")
+    parser.add_argument("--clients", default="1",
+                        help="comma-separated numbers of concurrent clients (default: 1)")
+    parser.add_argument("--repeat", type=int, default=1, help="times to replay the corpus per run")
+    parser.add_argument("--warmup", type=int, default=1, help="untimed requests before measuring")
+    parser.add_argument("--server", action="store_true", help="benchmark the running server instead")
+    parser.add_argument("--stub", action="store_true", help="use a stub model instead of Whisper")
+    parser.add_argument("--stub-rtf", type=float, default=0.05,
+                        help="seconds the stub model spends per second of audio")
+    parser.add_argument("--output", help="write the JSON result to this file instead of stdout")
+    parser.add_argument("--compare", help="earlier JSON result; exit with status 1 on regressions")
+    parser.add_argument("--tolerance", type=float, default=0.1,
+                        help="allowed relative p95 increase for --compare (default: 0.1)")
+    args = parser.parse_args(argv)
+    args.clients = [int(clients) for clients in args.clients.split(",")]
+
+    # Keep stdout for the JSON result; progress and server logs go to stderr.
+    with contextlib.redirect_stdout(sys.stderr):
+        if args.server:
+            configs = [_bench_server(args, load_corpus(args.corpus))]
+        else:
+            models = args.model or [os.getenv("WHISPER_SIZE_CPU", "Systran/faster-distil-whisper-large-v3")]
+            compute_types = args.compute_type or [os.getenv("WHISPER_COMPUTE_CPU", "int8")]
+            configs = []
+            for model in models:
+                for compute_type in compute_types:
+                    print(f"Benchmarking {model} ({args.device}, {compute_type})")
+                    configs.append(_run_config({
+                        "model": model,
+                        "compute_type": compute_type,
+                        "device": args.device,
+                        "language": args.language,
+                        "corpus": [os.path.abspath(path) for path in args.corpus],
+                        "clients": args.clients,
+                        "repeat": args.repeat,
+                        "warmup": args.warmup,
+                        "stub": args.stub,
+                        "stub_rtf": args.stub_rtf,
+                    }))
+
+    results = {
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "host": os.uname().nodename,
+        "cpu_count": os.cpu_count(),
+        "language": args.language,
+        "corpus": args.corpus,
+        "configs": configs,
+    }
+    output = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, "w") as output_file:
+            output_file.write(output + "\n")
+    else:
+        print(output)
+
+    if args.compare:
+        with open(args.compare) as baseline_file:
+            regressions = compare(results, json.load(baseline_file), args.tolerance)
+        for regression in regressions:
+            print(f"Regression: {regression}", file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    if sys.argv[1:2] == ["--worker"]:
+        config, result_path = json.loads(sys.argv[2]), sys.argv[3]
+        result = _worker(config)
+        with open(result_path, "w") as result_file:
+            json.dump(result, result_file)
+        # Model and loader threads may still be alive; the result is written.
+        os._exit(0)
+    main()
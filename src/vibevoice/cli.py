@@ -5,27 +5,58 @@ import subprocess
 import time
 import json
 import sounddevice as sd
-import numpy as np
 import requests
+import signal
 import sys
-import base64
-
-SCREENSHOT_AVAILABLE = False
-try:
-    import pyautogui
-    from PIL import Image
-    SCREENSHOT_AVAILABLE = True
-except ImportError as e:
-    print(f"Screenshot functionality not available: {e}")
-    print("Install Pillow with: pip install Pillow")
+import threading
+from concurrent.futures import ThreadPoolExecutor
 
 from pynput.keyboard import Controller as KeyboardController, Key, Listener, KeyCode
-from scipy.io import wavfile
 from dotenv import load_dotenv
 
+# The modules below read their settings when imported, so .env has to be loaded first.
+load_dotenv()
+
+from audio_buffer import RecordingBuffer
+from http_client import OLLAMA_URL, session
 from loading_indicator import LoadingIndicator
+from screenshot import SCREENSHOT_AVAILABLE, capture_screenshot
+from server_runtime import (
+    READY_FD_ENV,
+    RUNTIME_DIR,
+    SERVER_LOG_PATH,
+    find_running_server,
+    wait_for_ready_fd,
+    wait_for_ready_socket,
+)
+from transcription_client import (
+    SAMPLE_RATE,
+    RequestTrace,
+    TranscriptionStream,
+    english_params,
+    query_params,
+    request_transcript,
+    status_widget_listening,
+    swedish_params,
+)
+from typing_output import KeyboardOutput, TypingWorker
+
+# The status widget already shows each request's stage, so desktop notifications
+# are only needed while it isn't running (LOADING_NOTIFICATIONS=auto).
+loading_indicator = LoadingIndicator(widget_listening=status_widget_listening)
+
+OLLAMA_GENERATE_URL = f"{OLLAMA_URL}/api/generate"
+
+# Screenshot capture and the Ollama warm-up start when the command key is pressed,
+# so both are done by the time the transcript is final.
+llm_prefetch = ThreadPoolExecutor(max_workers=2, thread_name_prefix="llm-prefetch")
 
-loading_indicator = LoadingIndicator()
+# The custom key's transcript is rewritten by Ollama with the custom system prompt.
+# Pressing the key has Ollama evaluate that prompt while you speak; Ollama reuses
+# the evaluated prompt for the next request that starts with it, so the cleanup
+# only evaluates the transcript. Primings in flight are kept per (model, prompt).
+cleanup_primings = {}
+cleanup_primings_lock = threading.Lock()
 
 def load_custom_system_prompt():
     """Load custom system prompt from custom_prompt.md file."""
@@ -51,56 +82,96 @@ Your responses will be directly typed into the user's keyboard at their cursor p
     print("Using default system prompt (custom_prompt.md not found or empty)")
     return default_prompt
 
-def start_whisper_server():
+def start_whisper_server(persistent=False):
+    """Spawn server.py and return (process, readiness pipe read end).
+
+    A persistent server runs in its own session, so it outlives this CLI and
+    the next CLI start attaches to it instead of reloading the model. Its
+    output goes to SERVER_LOG_PATH rather than this terminal, which may be
+    closed while the server still writes to it.
+    """
     server_script = os.path.join(os.path.dirname(__file__), 'server.py')
-    process = subprocess.Popen(['python', server_script])
-    return process
+    ready_read, ready_write = os.pipe()
+    env = dict(os.environ, **{READY_FD_ENV: str(ready_write)})
+    log_file = None
+    if persistent:
+        os.makedirs(RUNTIME_DIR, mode=0o700, exist_ok=True)
+        log_file = open(SERVER_LOG_PATH, 'ab')
+        # Flush each line, so the log can be followed while the server runs.
+        env['PYTHONUNBUFFERED'] = '1'
+        print(f"Server output is logged to {SERVER_LOG_PATH}")
+    try:
+        process = subprocess.Popen(['python', server_script],
+                                   env=env,
+                                   pass_fds=(ready_write,),
+                                   stdin=subprocess.DEVNULL if persistent else None,
+                                   stdout=log_file,
+                                   stderr=subprocess.STDOUT if persistent else None,
+                                   start_new_session=persistent)
+    finally:
+        if log_file is not None:
+            log_file.close()
+        os.close(ready_write)
+    return process, ready_read
+
+def wait_for_server(ready_fd=None, timeout=1800):
+    """Block until the server reports it is ready; no polling involved.
 
-def wait_for_server(timeout=1800, interval=0.5):
-    start_time = time.time()
-    while time.time() - start_time < timeout:
+    Waits on the readiness pipe of a server we spawned, or on the readiness
+    socket of one that was already running.
+    """
+    if ready_fd is not None:
         try:
-            response = requests.get('http://localhost:4242/health')
-            if response.status_code == 200:
-                return True
-        except requests.exceptions.RequestException:
-            pass
-        time.sleep(interval)
-    raise TimeoutError("Server failed to start within timeout")
-
-def capture_screenshot():
-    """Capture a screenshot, save it, and return the path and base64 data."""
-    if not SCREENSHOT_AVAILABLE:
-        print("Screenshot functionality not available. Install Pillow with: pip install Pillow")
-        return None, None
-        
+            wait_for_ready_fd(ready_fd, timeout)
+            return True
+        except RuntimeError:
+            # Lost a start-up race against another client's server; attach to that one.
+            if find_running_server() is None:
+                raise
+        finally:
+            os.close(ready_fd)
+    wait_for_ready_socket(timeout)
+    return True
+
+def stop_whisper_server():
+    """Stop a running (persistent) server."""
+    server = find_running_server()
+    if not server or not server.get('pid'):
+        print("No vibevoice server is running.")
+        return
+    os.kill(server['pid'], signal.SIGTERM)
+    print(f"Stopped vibevoice server (pid {server['pid']}).")
+
+def _warm_up_ollama():
+    """Load the command model in Ollama (a request without a prompt) and keep it loaded."""
+    model = os.getenv('OLLAMA_MODEL', 'gemma3:27b')
     try:
-        screenshot_path = os.path.abspath('screenshot.png')
-        print(f"Capturing screenshot to: {screenshot_path}")
-        
-        screenshot = pyautogui.screenshot()
-        
-        max_width = int(os.getenv('SCREENSHOT_MAX_WIDTH', '1024'))
-        width, height = screenshot.size
-        
-        if width > max_width:
-            ratio = max_width / width
-            new_width = max_width
-            new_height = int(height * ratio)
-            screenshot = screenshot.resize((new_width, new_height))
-        
-        screenshot.save(screenshot_path)
-        
-        with open(screenshot_path, "rb") as image_file:
-            base64_data = base64.b64encode(image_file.read()).decode('utf-8')
-        
-        return screenshot_path, base64_data
-    except Exception as e:
-        print(f"Error capturing screenshot: {e}")
-        return None, None
+        started = time.perf_counter()
+        session.post(OLLAMA_GENERATE_URL,
+                      json={"model": model, "keep_alive": os.getenv('OLLAMA_KEEP_ALIVE', '10m')},
+                      timeout=120).raise_for_status()
+        print(f"Ollama model {model} is warm ({(time.perf_counter() - started) * 1000:.0f} ms)")
+    except requests.exceptions.RequestException as e:
+        print(f"Ollama warm-up failed: {e}")
+
+def prepare_llm_cmd():
+    """Start the Ollama warm-up and the screenshot on key press.
+
+    Returns a future for the base64 screenshot, or None when screenshots
+    are disabled.
+    """
+    llm_prefetch.submit(_warm_up_ollama)
+    if os.getenv('INCLUDE_SCREENSHOT', 'true').lower() == 'true' and SCREENSHOT_AVAILABLE:
+        return llm_prefetch.submit(capture_screenshot)
+    return None
+
+def _process_llm_cmd(keyboard_output, transcript, trace=None, screenshot=None):
+    """Process transcript with Ollama and type the response.
 
-def _process_llm_cmd(keyboard_controller, transcript):
-    """Process transcript with Ollama and type the response."""
+    `screenshot` is the future returned by prepare_llm_cmd(); without one
+    the screenshot is captured here. The response is read here and typed
+    by a TypingWorker, so typing never holds up the stream.
+    """
 
     try:
         loading_indicator.show(message=f"Processing: {transcript}")
@@ -108,9 +179,13 @@ def _process_llm_cmd(keyboard_controller, transcript):
         model = os.getenv('OLLAMA_MODEL', 'gemma3:27b')
         include_screenshot = os.getenv('INCLUDE_SCREENSHOT', 'true').lower() == 'true'
         
-        screenshot_path, screenshot_base64 = (None, None)
-        if include_screenshot and SCREENSHOT_AVAILABLE:
-            screenshot_path, screenshot_base64 = capture_screenshot()
+        screenshot_base64 = None
+        if screenshot is not None:
+            started = time.perf_counter()
+            screenshot_base64 = screenshot.result()
+            print(f"Waited {(time.perf_counter() - started) * 1000:.0f} ms for the screenshot")
+        elif include_screenshot and SCREENSHOT_AVAILABLE:
+            screenshot_base64 = capture_screenshot()
         
         user_prompt = transcript.strip()
         
@@ -124,46 +199,40 @@ Your responses will be directly typed into the user's keyboard at their cursor p
 6. Never apologize for limitations or explain what you're doing"""
         
         if screenshot_base64:
-            url = "http://localhost:11434/api/generate"
+            url = OLLAMA_GENERATE_URL
             payload = {
                 "model": model,
                 "prompt": user_prompt,
                 "system": system_prompt,
                 "stream": True,
+                "keep_alive": os.getenv('OLLAMA_KEEP_ALIVE', '10m'),
                 "images": [screenshot_base64]  # Pass base64 data directly without data URI prefix
             }
             print(f"Sending request with screenshot to model: {model}")
         else:
-            url = "http://localhost:11434/api/generate"
+            url = OLLAMA_GENERATE_URL
             payload = {
                 "model": model,
                 "prompt": user_prompt,
                 "system": system_prompt,
-                "stream": True
+                "stream": True,
+                "keep_alive": os.getenv('OLLAMA_KEEP_ALIVE', '10m')
             }
             print(f"Sending text-only request")
         
-        response = requests.post(url, json=payload, stream=True)
+        response = session.post(url, json=payload, stream=True)
         response.raise_for_status()
-        
-        for line in response.iter_lines():
-            if line:
-                data = line.decode('utf-8')
-                if data.startswith('{'):
-                    chunk = json.loads(data)
-                    if 'response' in chunk:
-                        chunk_text = chunk['response']
-                        print(f"Debug - received chunk: {repr(chunk_text)}")
-                        
-                        # Replace smart/curly quotes with standard apostrophes
-                        # U+2018 (') and U+2019 (') are both replaced with standard apostrophe (')
-                        normalized_text = chunk_text.replace('\u2019', "'").replace('\u2018', "'")
-                        
-                        # Remove newlines to prevent unwanted line breaks when typing
-                        normalized_text = normalized_text.replace('\n', ' ').replace('\r', ' ')
-                        
-                        keyboard_controller.type(normalized_text)
-                        loading_indicator.hide()
+
+        def on_first_output():
+            if trace is not None:
+                trace.first_keystroke()
+            loading_indicator.hide()
+
+        typing = TypingWorker(keyboard_output, on_first_output)
+        try:
+            _read_llm_stream(response, typing)
+        finally:
+            typing.close()
         
         return "Successfully processed with Ollama"
     except requests.exceptions.RequestException as e:
@@ -171,37 +240,159 @@ Your responses will be directly typed into the user's keyboard at their cursor p
     finally:
         loading_indicator.hide()
 
-def _transcribe_swedish(keyboard_controller, recording_path):
+def _read_llm_stream(response, typing):
+    """Queue the text of each streamed Ollama chunk for typing."""
+    for line in response.iter_lines():
+        if line:
+            data = line.decode('utf-8')
+            if data.startswith('{'):
+                chunk = json.loads(data)
+                if 'response' in chunk:
+                    chunk_text = chunk['response']
+                    print(f"Debug - received chunk: {repr(chunk_text)}")
+                    
+                    # Replace smart/curly quotes with standard apostrophes
+                    # U+2018 (') and U+2019 (') are both replaced with standard apostrophe (')
+                    normalized_text = chunk_text.replace('\u2019', "'").replace('\u2018', "'")
+                    
+                    # Remove newlines to prevent unwanted line breaks when typing
+                    normalized_text = normalized_text.replace('\n', ' ').replace('\r', ' ')
+                    
+                    typing.write(normalized_text)
+
+def _cleanup_model():
+    return os.getenv('OLLAMA_CLEANUP_MODEL') or os.getenv('OLLAMA_MODEL', 'gemma3:27b')
+
+def _prime_cleanup(model, system_prompt):
+    """Have Ollama evaluate the custom prompt so the next cleanup reuses it.
+
+    Ollama only loads the model for an empty prompt, so a one-character
+    prompt is sent with a single token to generate. Its answer is
+    discarded and nothing of it reaches a cleanup.
+    """
+    try:
+        started = time.perf_counter()
+        response = session.post(OLLAMA_GENERATE_URL, json={
+            "model": model,
+            "system": system_prompt,
+            "prompt": ".",
+            "stream": False,
+            "keep_alive": os.getenv('OLLAMA_KEEP_ALIVE', '10m'),
+            "options": {"num_predict": 1},
+        }, timeout=300)
+        response.raise_for_status()
+        print(f"Primed the cleanup prompt on {model} ({response.json().get('prompt_eval_count', 0)} tokens "
+              f"evaluated, {(time.perf_counter() - started) * 1000:.0f} ms)")
+    except (requests.exceptions.RequestException, ValueError) as e:
+        print(f"Priming the cleanup prompt failed: {e}")
+
+def prepare_cleanup(system_prompt):
+    """Start priming the cleanup prompt unless it is already priming.
+
+    Called on every key press, so priming overlaps with speaking and puts
+    the prompt back if Ollama unloaded the model or evicted it meanwhile.
+    """
+    key = (_cleanup_model(), system_prompt)
+    with cleanup_primings_lock:
+        future = cleanup_primings.get(key)
+        if future is None or future.done():
+            cleanup_primings[key] = llm_prefetch.submit(_prime_cleanup, *key)
+
+def _process_cleanup(keyboard_output, transcript, system_prompt, trace=None):
+    """Stream the transcript rewritten by Ollama with the custom prompt to the keyboard.
+
+    If Ollama fails before anything is typed, the raw transcript is typed
+    instead; after that, the text typed so far is left as it is.
+    """
+    typed_chars = 0
+    try:
+        loading_indicator.show(message=f"Cleaning up: {transcript}")
+        # The cleanup never waits for priming; a prompt not evaluated yet is
+        # simply evaluated as part of this request.
+        response = session.post(OLLAMA_GENERATE_URL, json={
+            "model": _cleanup_model(),
+            "system": system_prompt,
+            "prompt": transcript.strip(),
+            "stream": True,
+            "keep_alive": os.getenv('OLLAMA_KEEP_ALIVE', '10m'),
+        }, stream=True)
+        response.raise_for_status()
+
+        def on_first_output():
+            if trace is not None:
+                trace.first_keystroke()
+            loading_indicator.hide()
+
+        typing = TypingWorker(keyboard_output, on_first_output)
+        try:
+            _read_llm_stream(response, typing)
+            typing.write(" ")
+        finally:
+            typed_chars = typing.close()["chars"]
+    except requests.exceptions.RequestException as e:
+        if typed_chars:
+            print(f"Ollama cleanup stopped after {typed_chars} typed characters: {e}")
+        else:
+            print(f"Error cleaning up the transcript with Ollama ({e}); typing it as transcribed")
+            keyboard_output.inject(transcript + " ")
+    finally:
+        loading_indicator.hide()
+
+def _transcribe_and_clean_up(keyboard_output, audio, system_prompt, stream=None, trace=None):
+    """Transcribe audio with the Swedish parameters and type it cleaned up by Ollama."""
+    try:
+        loading_indicator.show(message="Transcribing for cleanup...")
+
+        transcript = request_transcript(swedish_params(), audio, stream, trace)
+
+        loading_indicator.hide()
+        if transcript:
+            if trace is not None:
+                trace.transcribed()
+            _process_cleanup(keyboard_output, transcript, system_prompt, trace)
+    except requests.exceptions.RequestException as e:
+        print(f"Error transcribing for cleanup: {e}")
+    finally:
+        loading_indicator.hide()
+
+def _dictate(keyboard_output, params, audio, stream=None, trace=None):
+    """Type a dictation and return its transcript.
+
+    A recording that was not streamed live is typed segment by segment as
+    the server decodes it (TYPE_SEGMENTS=false waits for the whole text),
+    so a long dictation starts appearing after its first segment.
+    """
+    def on_first_output():
+        if trace is not None:
+            trace.first_keystroke()
+        loading_indicator.hide()
+
+    typing = TypingWorker(keyboard_output, on_first_output)
+    typed_segments = []
+
+    def on_segment(text):
+        typed_segments.append(text)
+        typing.write(text + " ")
+
+    try:
+        type_segments = os.getenv('TYPE_SEGMENTS', 'true').lower() == 'true'
+        transcript = request_transcript(params, audio, stream, trace, on_segment if type_segments else None)
+        # Cached, batched and long-form results only arrive as a whole.
+        if transcript and not typed_segments:
+            typing.write(transcript + " ")
+    finally:
+        typing.close()
+    return transcript
+
+def _transcribe_swedish(keyboard_output, audio, stream=None, trace=None):
     """Transcribe audio to Swedish with software development context."""
     try:
         loading_indicator.show(message="Transcribing to Swedish...")
 
-        # Get configurable parameters from environment
-        swedish_language = os.getenv('SWEDISH_LANGUAGE', 'sv')
-        swedish_prompt = os.getenv('SWEDISH_PROMPT',
-            'Det här är en intervju om mjukvaruutveckling och SaaS med svenska termer. Å, Ä, Ö ska användas. Termer: API, databas, skalbarhet, deployment, commit, branch, merge, pull request, issue, sprint, backlog, scrum, kanban, devops, CI/CD, docker, kubernetes, microservices, serverless, cloud, azure, aws.')
-
-        # Send transcription request with Swedish language and advanced decoding parameters
-        response = requests.post('http://localhost:4242/transcribe/',
-                              json={
-                                  'file_path': recording_path,
-                                  'language': swedish_language,
-                                  'task': 'transcribe',
-                                  'initial_prompt': swedish_prompt,
-                                  'beam_size': 5,
-                                  'best_of': 1,
-                                  'temperature': 0,
-                                  'vad_filter': True,
-                                  'vad_parameters': { 'min_silence_duration_ms': 200, 'speech_pad_ms': 120 },
-                                  'log_prob_threshold': -1.0
-                              })
-        response.raise_for_status()
-        transcript = response.json()['text']
+        transcript = _dictate(keyboard_output, swedish_params(), audio, stream, trace)
 
         if transcript:
-            processed_transcript = transcript + " "
-            print(f"Swedish: {processed_transcript}")
-            keyboard_controller.type(processed_transcript)
+            print(f"Swedish: {transcript} ")
 
         loading_indicator.hide()
         return "Successfully transcribed to Swedish"
@@ -210,37 +401,15 @@ def _transcribe_swedish(keyboard_controller, recording_path):
     finally:
         loading_indicator.hide()
 
-def _transcribe_english(keyboard_controller, recording_path):
+def _transcribe_english(keyboard_output, audio, stream=None, trace=None):
     """Transcribe audio to English with software development context."""
     try:
         loading_indicator.show(message="Transcribing to English...")
 
-        # Get configurable parameters from environment
-        english_language = os.getenv('ENGLISH_LANGUAGE', 'en')
-        english_prompt = os.getenv('ENGLISH_PROMPT',
-            'This is a technical discussion about software development, SaaS, and startups. Technical terms include programming, APIs, databases, cloud services, scalability, deployment, commit, branch, merge, pull request, issue, sprint, backlog, scrum, kanban, devops, CI/CD, docker, kubernetes, microservices, serverless.')
-
-        # Send transcription request with English language and advanced decoding parameters
-        response = requests.post('http://localhost:4242/transcribe/',
-                              json={
-                                  'file_path': recording_path,
-                                  'language': english_language,
-                                  'task': 'transcribe',
-                                  'initial_prompt': english_prompt,
-                                  'beam_size': 5,
-                                  'best_of': 1,
-                                  'temperature': 0,
-                                  'vad_filter': True,
-                                  'vad_parameters': { 'min_silence_duration_ms': 200, 'speech_pad_ms': 120 },
-                                  'log_prob_threshold': -1.0
-                              })
-        response.raise_for_status()
-        transcript = response.json()['text']
+        transcript = _dictate(keyboard_output, english_params(), audio, stream, trace)
 
         if transcript:
-            processed_transcript = transcript + " "
-            print(f"English: {processed_transcript}")
-            keyboard_controller.type(processed_transcript)
+            print(f"English: {transcript} ")
 
         loading_indicator.hide()
         return "Successfully transcribed to English"
@@ -250,7 +419,14 @@ def _transcribe_english(keyboard_controller, recording_path):
         loading_indicator.hide()
 
 def main():
-    load_dotenv()
+    if sys.argv[1:] == ['stop-server']:
+        stop_whisper_server()
+        return
+    if sys.argv[1:2] == ['bench']:
+        from bench import main as bench_main
+        bench_main(sys.argv[2:])
+        return
+
     key_label = os.environ.get("VOICEKEY", "ctrl_r")
     cmd_label = os.environ.get("VOICEKEY_CMD", "scroll_lock")
     custom_label = os.environ.get("VOICEKEY_CUSTOM", "num_lock")
@@ -261,81 +437,127 @@ def main():
 
     # Load custom system prompt at startup
     custom_system_prompt = load_custom_system_prompt()
+    # The custom key rewrites its transcript with that prompt, unless CUSTOM_KEY_CLEANUP=false
+    cleanup_enabled = os.getenv('CUSTOM_KEY_CLEANUP', 'true').lower() == 'true'
+
+    # Stream dictation audio to the server while the key is held
+    streaming_enabled = os.getenv('STREAM_TRANSCRIPTION', 'true').lower() == 'true'
 
     recording = False
-    audio_data = []
-    sample_rate = 16000
-    keyboard_controller = KeyboardController()
+    recording_buffer = RecordingBuffer(SAMPLE_RATE)
+    stream = None
+    trace = None
+    screenshot = None
+    keyboard_output = KeyboardOutput(KeyboardController())
 
     def on_press(key):
-        nonlocal recording, audio_data
+        nonlocal recording, stream, trace, screenshot
         if (key == RECORD_KEY or key == CMD_KEY or key == CUSTOM_KEY) and not recording:
+            trace = RequestTrace(publish=True)
+            if streaming_enabled and key == RECORD_KEY:
+                stream = TranscriptionStream(query_params(english_params()), trace)
+            elif key == CUSTOM_KEY:
+                if cleanup_enabled:
+                    prepare_cleanup(custom_system_prompt)
+                if streaming_enabled:
+                    stream = TranscriptionStream(query_params(swedish_params()), trace)
+            elif key == CMD_KEY:
+                # Overlap the screenshot, the Ollama warm-up and transcription with speaking.
+                screenshot = prepare_llm_cmd()
+                if streaming_enabled:
+                    stream = TranscriptionStream({}, trace)
+            recording_buffer.reset()
             recording = True
-            audio_data = []
             print("Listening...")
 
     def on_release(key):
-        nonlocal recording, audio_data
+        nonlocal recording, stream
         if key == RECORD_KEY or key == CMD_KEY or key == CUSTOM_KEY:
             recording = False
+            active_stream, stream = stream, None
+            # A view of the capture buffer; valid until the next key press.
+            audio_data_np = recording_buffer.view()
+            if trace is not None:
+                trace.release(round(len(audio_data_np) / SAMPLE_RATE, 2))
             print("Transcribing...")
             
-            try:
-                audio_data_np = np.concatenate(audio_data, axis=0)
-            except ValueError as e:
-                print(e)
+            if len(audio_data_np) == 0:
+                print("No audio was recorded")
+                if active_stream is not None:
+                    try:
+                        active_stream.finish()
+                    except requests.exceptions.RequestException:
+                        pass
+                if trace is not None:
+                    trace.finish()
                 return
-            
-            recording_path = os.path.abspath('recording.wav')
-            audio_data_int16 = (audio_data_np * np.iinfo(np.int16).max).astype(np.int16)
-            wavfile.write(recording_path, sample_rate, audio_data_int16)
 
             try:
                 if key == RECORD_KEY:
                     # English transcription with software development context
-                    _transcribe_english(keyboard_controller, recording_path)
+                    _transcribe_english(keyboard_output, audio_data_np, active_stream, trace)
                 elif key == CMD_KEY:
                     # AI command mode (existing functionality)
-                    response = requests.post('http://localhost:4242/transcribe/',
-                                          json={'file_path': recording_path})
-                    response.raise_for_status()
-                    transcript = response.json()['text']
+                    transcript = request_transcript({}, audio_data_np, active_stream, trace)
                     if transcript:
-                        _process_llm_cmd(keyboard_controller, transcript)
+                        _process_llm_cmd(keyboard_output, transcript, trace, screenshot)
+                elif key == CUSTOM_KEY and cleanup_enabled:
+                    # Transcript rewritten by Ollama with the custom system prompt
+                    _transcribe_and_clean_up(keyboard_output, audio_data_np, custom_system_prompt,
+                                             active_stream, trace)
                 elif key == CUSTOM_KEY:
                     # Swedish transcription with software development context
-                    _transcribe_swedish(keyboard_controller, recording_path)
+                    _transcribe_swedish(keyboard_output, audio_data_np, active_stream, trace)
             except requests.exceptions.RequestException as e:
                 print(f"Error sending request to local API: {e}")
             except Exception as e:
                 print(f"Error processing transcript: {e}")
+            finally:
+                if trace is not None:
+                    trace.finish()
 
     def callback(indata, frames, time, status):
         if status:
             print(status)
         if recording:
-            audio_data.append(indata.copy())
+            recording_buffer.write(indata)
+            active_stream = stream
+            if active_stream is not None:
+                active_stream.write(indata)
 
-    server_process = start_whisper_server()
+    # Keep the server (and its loaded models) running after the CLI exits
+    keep_server = os.getenv('KEEP_SERVER_RUNNING', 'true').lower() == 'true'
+
+    server_process, ready_fd = None, None
+    running_server = find_running_server()
+    if running_server is not None:
+        print(f"Attaching to running vibevoice server (pid {running_server.get('pid')})")
+    else:
+        server_process, ready_fd = start_whisper_server(persistent=keep_server)
     
     try:
         print(f"Waiting for the server to be ready...")
-        wait_for_server()
+        wait_for_server(ready_fd)
         print(f"vibevoice is active.")
         print(f"  {key_label}: English transcription (software development context)")
         print(f"  {cmd_label}: AI command mode (with screenshot if enabled)")
-        print(f"  {custom_label}: Swedish transcription (software development context)")
+        if cleanup_enabled:
+            print(f"  {custom_label}: Swedish transcription cleaned up by Ollama ({_cleanup_model()}, custom system prompt)")
+        else:
+            print(f"  {custom_label}: Swedish transcription (software development context)")
         with Listener(on_press=on_press, on_release=on_release) as listener:
-            with sd.InputStream(callback=callback, channels=1, samplerate=sample_rate):
+            with sd.InputStream(callback=callback, channels=1, samplerate=SAMPLE_RATE):
                 listener.join()
-    except TimeoutError as e:
+    except (TimeoutError, RuntimeError, OSError) as e:
         print(f"Error: {e}")
-        server_process.terminate()
+        if server_process is not None:
+            server_process.terminate()
         sys.exit(1)
     except KeyboardInterrupt:
         print("\nStopping...")
     finally:
-        server_process.terminate()
+        if server_process is not None and not keep_server:
+            server_process.terminate()
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,157 @@
+"""Calibrate CTranslate2 CPU threads and workers for the CPU fallback path"""
+
+import json
+import os
+import socket
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+SAMPLE_RATE = 16000
+CLIP_SECONDS = 8
+
+CACHE_DIR = os.path.join(os.getenv("XDG_CACHE_HOME") or os.path.expanduser("~/.cache"), "vibevoice")
+TUNING_PATH = os.path.join(CACHE_DIR, "cpu_tuning.json")
+
+# A candidate may be this much slower per request than the fastest
+# single-worker setting and still win on throughput.
+LATENCY_SLACK = 1.25
+
+_file_lock = threading.Lock()
+# Calibrations of different models would compete for the same cores and skew
+# each other's timings, so only one runs at a time.
+_calibration_lock = threading.Lock()
+
+
+def available_cores() -> int:
+    """Cores this process may run on (respects taskset and cgroup cpusets)."""
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+def calibration_clip() -> np.ndarray:
+    """A deterministic, speech-like clip: voiced harmonics with syllable-rate envelopes.
+
+    Its transcript is meaningless, but it makes the encoder and the beam
+    search do the same amount of work as a real dictation of this length.
+    """
+    t = np.arange(CLIP_SECONDS * SAMPLE_RATE) / SAMPLE_RATE
+    pitch = 140 + 25 * np.sin(2 * np.pi * 0.7 * t)
+    phase = 2 * np.pi * np.cumsum(pitch) / SAMPLE_RATE
+    voice = sum(np.sin(k * phase) / k for k in range(1, 12))
+    syllables = np.clip(np.sin(2 * np.pi * 4 * t), 0, None) * (np.sin(2 * np.pi * 0.3 * t) > -0.6)
+    noise = np.random.default_rng(0).standard_normal(len(t)) * 0.01
+    return (0.1 * voice * syllables + noise).astype(np.float32)
+
+
+def candidates(cores: int, max_workers: int):
+    """(cpu_threads, num_workers) pairs that fit in `cores` without oversubscribing."""
+    thread_counts = sorted({max(1, cores // 4), max(1, cores // 2), cores} | {n for n in (4, 8) if n <= cores})
+    pairs = []
+    for workers in range(1, max(1, max_workers) + 1):
+        for threads in thread_counts:
+            if threads * workers <= cores:
+                pairs.append((threads, workers))
+    return pairs
+
+
+def _tuning_key(model_name: str, compute_type: str) -> str:
+    return f"{model_name}|{compute_type}"
+
+
+def _read_all() -> dict:
+    try:
+        with open(TUNING_PATH) as tuning_file:
+            return json.load(tuning_file)
+    except (OSError, ValueError):
+        return {}
+
+
+def load_tuning(model_name: str, compute_type: str, cores: int):
+    """The stored calibration for this host, model and core budget, or None."""
+    entry = _read_all().get(socket.gethostname(), {}).get(_tuning_key(model_name, compute_type))
+    if entry is None or entry.get("cores") != cores:
+        return None
+    return entry
+
+
+def save_tuning(model_name: str, compute_type: str, entry: dict):
+    with _file_lock:
+        data = _read_all()
+        data.setdefault(socket.gethostname(), {})[_tuning_key(model_name, compute_type)] = entry
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        temporary_path = f"{TUNING_PATH}.{os.getpid()}"
+        with open(temporary_path, "w") as tuning_file:
+            json.dump(data, tuning_file, indent=2)
+        os.replace(temporary_path, TUNING_PATH)
+
+
+def _measure(model, clip, workers: int, repeats: int = 2):
+    """Return (per-request RTF, throughput RTF) with `workers` decodes in parallel."""
+    clip_seconds = len(clip) / SAMPLE_RATE
+
+    def decode():
+        started = time.perf_counter()
+        segments, _ = model.transcribe(
+            clip, language="en", beam_size=5, temperature=0.0, vad_filter=False,
+            condition_on_previous_text=False, without_timestamps=True, max_new_tokens=48,
+        )
+        list(segments)
+        return time.perf_counter() - started
+
+    decode()  # warm-up
+    best = None
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for _ in range(repeats):
+            started = time.perf_counter()
+            latencies = list(pool.map(lambda _: decode(), range(workers)))
+            wall = time.perf_counter() - started
+            result = (max(latencies) / clip_seconds, wall / (workers * clip_seconds))
+            if best is None or result[1] < best[1]:
+                best = result
+    return best
+
+
+def calibrate(load_model, model_name: str, compute_type: str, cores: int, max_workers: int) -> dict:
+    """Measure each candidate on the built-in clip and return the best setting.
+
+    load_model(cpu_threads, num_workers) must return a fresh CPU model. The
+    winner has the lowest throughput RTF among candidates whose per-request
+    RTF is within LATENCY_SLACK of the fastest single-worker candidate.
+    Concurrent calls wait for each other.
+    """
+    clip = calibration_clip()
+    results = []
+    with _calibration_lock:
+        for threads, workers in candidates(cores, max_workers):
+            model = load_model(threads, workers)
+            try:
+                request_rtf, throughput_rtf = _measure(model, clip, workers)
+            finally:
+                model.model.unload_model()
+                del model
+            print(f"CPU calibration: cpu_threads={threads} num_workers={workers}: "
+                  f"RTF {request_rtf:.3f} per request, {throughput_rtf:.3f} for throughput")
+            results.append({
+                "cpu_threads": threads,
+                "num_workers": workers,
+                "request_rtf": round(request_rtf, 4),
+                "throughput_rtf": round(throughput_rtf, 4),
+            })
+
+    fastest = min(result["request_rtf"] for result in results if result["num_workers"] == 1)
+    eligible = [result for result in results if result["request_rtf"] <= fastest * LATENCY_SLACK]
+    best = min(eligible, key=lambda result: (result["throughput_rtf"], result["cpu_threads"]))
+    return {
+        "cpu_threads": best["cpu_threads"],
+        "num_workers": best["num_workers"],
+        "request_rtf": best["request_rtf"],
+        "throughput_rtf": best["throughput_rtf"],
+        "cores": cores,
+        "calibrated_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "candidates": results,
+    }
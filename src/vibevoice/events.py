@@ -0,0 +1,77 @@
+"""Server-Sent Events for server state changes"""
+
+import asyncio
+import json
+import threading
+
+# Idle subscribers get a comment line this often; writing it is also how the
+# server notices subscribers that went away.
+KEEPALIVE_SECONDS = 15
+
+
+def format_event(event_type: str, data: dict) -> str:
+    return f"event: {event_type}\ndata: {json.dumps(data)}\n\n"
+
+
+class EventBroker:
+    """Fan state changes out to SSE subscribers.
+
+    publish() may be called from any thread. The latest event per
+    (type, key) is kept, so a new subscriber first receives the current
+    state and then every change as it happens.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._state = {}
+        self._subscribers = set()
+        self._closed = False
+
+    def publish(self, event_type: str, data: dict, key: str = None):
+        message = format_event(event_type, data)
+        with self._lock:
+            self._state[(event_type, key)] = message
+            subscribers = list(self._subscribers)
+        self._send(subscribers, message)
+
+    def close(self):
+        """End every open stream, so the server can shut down without waiting for them."""
+        with self._lock:
+            self._closed = True
+            subscribers = list(self._subscribers)
+        self._send(subscribers, None)
+
+    def subscriber_count(self) -> int:
+        with self._lock:
+            return len(self._subscribers)
+
+    def _send(self, subscribers, message):
+        for loop, messages in subscribers:
+            try:
+                loop.call_soon_threadsafe(messages.put_nowait, message)
+            except RuntimeError:
+                # The subscriber's event loop is already closed.
+                pass
+
+    async def subscribe(self):
+        """Yield SSE messages: the current state, then each change."""
+        subscriber = (asyncio.get_running_loop(), asyncio.Queue())
+        with self._lock:
+            if self._closed:
+                return
+            snapshot = list(self._state.values())
+            self._subscribers.add(subscriber)
+        try:
+            for message in snapshot:
+                yield message
+            while True:
+                try:
+                    message = await asyncio.wait_for(subscriber[1].get(), KEEPALIVE_SECONDS)
+                except asyncio.TimeoutError:
+                    message = ": keepalive\n\n"
+                if message is None:
+                    return
+                yield message
+        finally:
+            with self._lock:
+                self._subscribers.discard(subscriber)
@@ -0,0 +1,92 @@
+"""Shared, pooled HTTP session for calls to the local server and Ollama"""
+
+import os
+import socket
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection
+from urllib3.connectionpool import HTTPConnectionPool
+
+from server_runtime import SERVER_SOCKET_PATH
+
+SERVER_URL = "http://localhost:4242"
+OLLAMA_URL = "http://localhost:11434"
+
+# "auto" talks to the server over its Unix socket whenever that socket exists and
+# over TCP otherwise; "tcp" always uses TCP.
+SERVER_TRANSPORT = os.getenv("VIBEVOICE_TRANSPORT", "auto").lower()
+
+
+class _UnixSocketConnection(HTTPConnection):
+    """HTTP connection over the server's Unix socket, or TCP if it is missing."""
+
+    def __init__(self, *args, socket_path: str = None, **kwargs):
+        self.socket_path = socket_path
+        super().__init__(*args, **kwargs)
+
+    def connect(self):
+        if not os.path.exists(self.socket_path):
+            return super().connect()
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            sock.settimeout(self.timeout if isinstance(self.timeout, (int, float)) else None)
+            sock.connect(self.socket_path)
+        except OSError:
+            sock.close()
+            # A stale socket file from a server that is gone; fall back to TCP.
+            return super().connect()
+        self.sock = sock
+
+
+class _UnixSocketPool(HTTPConnectionPool):
+    ConnectionCls = _UnixSocketConnection
+
+
+class UnixSocketAdapter(HTTPAdapter):
+    """Send requests for one host:port over a Unix socket, keeping connections alive."""
+
+    def __init__(self, socket_path: str, **kwargs):
+        self.socket_path = socket_path
+        self._pools = {}
+        super().__init__(**kwargs)
+
+    def _pool(self, url) -> HTTPConnectionPool:
+        parsed = requests.utils.urlparse(url)
+        key = (parsed.hostname, parsed.port)
+        pool = self._pools.get(key)
+        if pool is None:
+            pool = self._pools[key] = _UnixSocketPool(
+                parsed.hostname, parsed.port, maxsize=self._pool_maxsize, block=self._pool_block,
+                socket_path=self.socket_path,
+            )
+        return pool
+
+    def get_connection_with_tls_context(self, request, verify, proxies=None, cert=None):
+        return self._pool(request.url)
+
+    def get_connection(self, url, proxies=None):
+        return self._pool(url)
+
+    def close(self):
+        super().close()
+        for pool in self._pools.values():
+            pool.close()
+        self._pools.clear()
+
+
+def create_session() -> requests.Session:
+    """A session with keep-alive pools for the server and Ollama.
+
+    Both are on localhost, so proxies from the environment are ignored.
+    """
+    new_session = requests.Session()
+    new_session.trust_env = False
+    new_session.mount("http://", HTTPAdapter(pool_connections=4, pool_maxsize=8))
+    if SERVER_TRANSPORT != "tcp":
+        new_session.mount(f"{SERVER_URL}/", UnixSocketAdapter(SERVER_SOCKET_PATH, pool_maxsize=8))
+    return new_session
+
+
+# One session per process; urllib3's pools are safe to share between threads.
+session = create_session()
@@ -0,0 +1,114 @@
+"""Bounded worker pools for blocking Whisper inference"""
+
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+
+class QueueFullError(Exception):
+    """Raised when a model already has as many requests as its pool accepts."""
+
+
+class InferencePool:
+    """Run blocking inference off the event loop, one bounded pool per model.
+
+    Each model gets `concurrency` worker threads (unless set_concurrency
+    overrides it) and accepts at most `max_queue` further requests waiting
+    for a worker. Anything beyond that is rejected immediately with
+    QueueFullError instead of piling up.
+
+    on_change(active, queued), if given, is called with the totals across
+    all models whenever a request starts waiting or finishes.
+    """
+
+    def __init__(self, concurrency: int = 1, max_queue: int = 8, on_change=None):
+        self.concurrency = max(1, concurrency)
+        self.max_queue = max(0, max_queue)
+        self.on_change = on_change
+        self._lock = threading.Lock()
+        self._executors = {}
+        self._pending = {}
+        self._concurrency = {}
+
+    def set_concurrency(self, key, concurrency: int):
+        """Run `concurrency` requests in parallel for one model, e.g. its calibrated num_workers."""
+        with self._lock:
+            self._concurrency[key] = max(1, concurrency)
+            executor = self._executors.pop(key, None)
+        if executor is not None:
+            executor.shutdown(wait=False)
+
+    def _limit(self, key) -> int:
+        return self._concurrency.get(key, self.concurrency)
+
+    def concurrency_of(self, key) -> int:
+        """How many requests run in parallel for one model."""
+        with self._lock:
+            return self._limit(key)
+
+    def _executor(self, key) -> ThreadPoolExecutor:
+        executor = self._executors.get(key)
+        if executor is None:
+            executor = ThreadPoolExecutor(
+                max_workers=self._limit(key),
+                thread_name_prefix=f"whisper-{key[0]}",
+            )
+            self._executors[key] = executor
+        return executor
+
+    async def run(self, key, fn, *args, **kwargs):
+        """Run fn(*args, **kwargs) on the pool for `key` and await the result."""
+        with self._lock:
+            pending = self._pending.get(key, 0)
+            if pending >= self._limit(key) + self.max_queue:
+                raise QueueFullError(f"{pending} requests already pending for {key[0]}")
+            self._pending[key] = pending + 1
+            executor = self._executor(key)
+            totals = self._totals()
+        self._notify(totals)
+
+        try:
+            return await asyncio.wrap_future(executor.submit(fn, *args, **kwargs))
+        finally:
+            with self._lock:
+                self._pending[key] -= 1
+                totals = self._totals()
+            self._notify(totals)
+
+    def _totals(self):
+        """(active, queued) across all models; call with the lock held."""
+        active = sum(min(pending, self._limit(key)) for key, pending in self._pending.items())
+        queued = sum(max(0, pending - self._limit(key)) for key, pending in self._pending.items())
+        return active, queued
+
+    def _notify(self, totals):
+        if self.on_change is not None:
+            self.on_change(*totals)
+
+    def queue_depth(self) -> int:
+        """Total number of requests waiting for a worker across all models."""
+        with self._lock:
+            return self._totals()[1]
+
+    def stats(self) -> dict:
+        with self._lock:
+            models = {
+                "/".join(key): {
+                    "concurrency": self._limit(key),
+                    "active": min(pending, self._limit(key)),
+                    "queued": max(0, pending - self._limit(key)),
+                }
+                for key, pending in self._pending.items()
+            }
+        return {
+            "concurrency": self.concurrency,
+            "max_queue": self.max_queue,
+            "models": models,
+        }
+
+    def shutdown(self, key):
+        """Drop the pool for a model that is no longer loaded."""
+        with self._lock:
+            executor = self._executors.pop(key, None)
+        if executor is not None:
+            executor.shutdown(wait=False)
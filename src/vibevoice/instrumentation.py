@@ -0,0 +1,172 @@
+"""Per-request stage timings for the transcription path"""
+
+import functools
+import threading
+import time
+from contextlib import contextmanager
+
+import faster_whisper.transcribe as faster_whisper_transcribe
+
+_active = threading.local()
+
+
+def temperature_label(temperature: float) -> str:
+    """The label of a sampling temperature in timings and metrics, e.g. "0" or "0.2"."""
+    return f"{float(temperature):g}"
+
+
+class RequestTimings:
+    """Seconds spent in each stage of one request.
+
+    Stages are accumulated, so a request that runs a stage several times
+    (one encode per 30 s window, several streaming passes) reports the total.
+    Decoding is kept per sampling temperature to show the cost of fallbacks.
+    """
+
+    def __init__(self, request_id: str):
+        self.request_id = request_id
+        self.stages = {}
+        self.decode = {}
+        self.audio_seconds = None
+        self.cached = False
+        self._lock = threading.Lock()
+
+    def add(self, stage: str, seconds: float):
+        with self._lock:
+            self.stages[stage] = self.stages.get(stage, 0.0) + seconds
+
+    def add_decode(self, temperature: float, seconds: float):
+        label = temperature_label(temperature)
+        with self._lock:
+            self.decode[label] = self.decode.get(label, 0.0) + seconds
+
+    @contextmanager
+    def stage(self, name: str):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - started)
+
+    def merge(self, other: "RequestTimings", share: float = 1.0):
+        """Add `share` of another request's stages, e.g. this request's part of a batch.
+
+        queue_wait is added in full, as every request in a batch waited for it.
+        """
+        for name, seconds in other.stages.items():
+            self.add(name, seconds if name == "queue_wait" else seconds * share)
+        for label, seconds in other.decode.items():
+            self.add_decode(float(label), seconds * share)
+
+    @property
+    def real_time_factor(self):
+        """Inference seconds per second of audio, or None if either is unknown."""
+        inference = self.stages.get("inference")
+        if not inference or not self.audio_seconds:
+            return None
+        return inference / self.audio_seconds
+
+    def as_dict(self) -> dict:
+        with self._lock:
+            stages = {name: round(seconds, 4) for name, seconds in self.stages.items()}
+            decode = {label: round(seconds, 4) for label, seconds in self.decode.items()}
+        rtf = self.real_time_factor
+        return {
+            "request_id": self.request_id,
+            "cached": self.cached,
+            "audio_seconds": round(self.audio_seconds, 3) if self.audio_seconds is not None else None,
+            "real_time_factor": round(rtf, 4) if rtf is not None else None,
+            "stages": stages,
+            "decode_by_temperature": decode,
+        }
+
+
+@contextmanager
+def activate(timings: RequestTimings):
+    """Attribute stages run by this thread to `timings` until the block exits."""
+    previous = getattr(_active, "timings", None)
+    _active.timings = timings
+    try:
+        yield timings
+    finally:
+        _active.timings = previous
+
+
+def current_timings():
+    """The RequestTimings active on this thread, if any."""
+    return getattr(_active, "timings", None)
+
+
+@contextmanager
+def stage(name: str):
+    """Time a block into the active request, if there is one."""
+    timings = current_timings()
+    if timings is None:
+        yield
+        return
+    with timings.stage(name):
+        yield
+
+
+def _timed(name: str, fn):
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        with stage(name):
+            return fn(*args, **kwargs)
+    return wrapper
+
+
+class _TimedFeatureExtractor:
+    """Feature extractor proxy that times each call as the "features" stage."""
+
+    def __init__(self, extractor):
+        self._extractor = extractor
+
+    def __getattr__(self, name):
+        return getattr(self._extractor, name)
+
+    def __call__(self, *args, **kwargs):
+        with stage("features"):
+            return self._extractor(*args, **kwargs)
+
+
+class _TimedGenerator:
+    """CTranslate2 model proxy that times generate() per sampling temperature."""
+
+    def __init__(self, model):
+        self._model = model
+
+    def __getattr__(self, name):
+        return getattr(self._model, name)
+
+    def generate(self, *args, **kwargs):
+        timings = current_timings()
+        if timings is None:
+            return self._model.generate(*args, **kwargs)
+        started = time.perf_counter()
+        try:
+            return self._model.generate(*args, **kwargs)
+        finally:
+            timings.add_decode(kwargs.get("sampling_temperature", 0.0), time.perf_counter() - started)
+
+
+def install_module_hooks():
+    """Time the audio file decode and the VAD that faster-whisper runs inside transcribe()."""
+    module = faster_whisper_transcribe
+    if getattr(module, "_vibevoice_timed", False):
+        return
+    module.decode_audio = _timed("audio_decode", module.decode_audio)
+    module.get_speech_timestamps = _timed("vad", module.get_speech_timestamps)
+    module._vibevoice_timed = True
+
+
+def instrument_model(model):
+    """Time feature extraction, encoding and decoding of a loaded WhisperModel.
+
+    The wrappers only record while a RequestTimings is active on the calling
+    thread and otherwise add a single attribute lookup per call.
+    """
+    model.feature_extractor = _TimedFeatureExtractor(model.feature_extractor)
+    model.encode = _timed("encode", model.encode)
+    model.model = _TimedGenerator(model.model)
+    return model
@@ -0,0 +1,111 @@
+"""Language routing for language="auto" requests"""
+
+import threading
+import time
+from typing import Dict, List, Optional
+
+
+def candidate_probabilities(all_language_probs, candidates: List[str]) -> Dict[str, float]:
+    """Whisper's language probabilities restricted to the candidates, summing to 1."""
+    probabilities = {language: 0.0 for language in candidates}
+    for language, probability in all_language_probs:
+        if language in probabilities:
+            probabilities[language] = probability
+    total = sum(probabilities.values())
+    if total <= 0:
+        return {language: 1 / len(candidates) for language in candidates}
+    return {language: probability / total for language, probability in probabilities.items()}
+
+
+class LanguageSessions:
+    """The language detected for each session, kept for ttl_seconds.
+
+    Requests of a session that already has a language skip detection.
+    """
+
+    def __init__(self, ttl_seconds: float = 300):
+        self.ttl_seconds = ttl_seconds
+        self._languages = {}
+        self._lock = threading.Lock()
+
+    def get(self, session_id: Optional[str]) -> Optional[str]:
+        if not session_id or self.ttl_seconds <= 0:
+            return None
+        with self._lock:
+            entry = self._languages.get(session_id)
+            if entry is None:
+                return None
+            language, expires_at = entry
+            if expires_at < time.monotonic():
+                del self._languages[session_id]
+                return None
+            return language
+
+    def put(self, session_id: Optional[str], language: str):
+        if not session_id or self.ttl_seconds <= 0:
+            return
+        now = time.monotonic()
+        with self._lock:
+            # Drop expired sessions so clients that never come back do not pile up.
+            for key, (_, expires_at) in list(self._languages.items()):
+                if expires_at < now:
+                    del self._languages[key]
+            self._languages[session_id] = (language, now + self.ttl_seconds)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"sessions": len(self._languages), "ttl_seconds": self.ttl_seconds}
+
+
+class LanguageRace:
+    """Pick between speculative decodes of the same audio in different languages.
+
+    Each decode reports its segments as they come out. A candidate is scored
+    by the mean avg_logprob of its segments so far; once every candidate has
+    a score, the ones behind the leader are told to stop at their next
+    segment. Ties go to the candidate with the higher detection probability.
+    """
+
+    def __init__(self, probabilities: Dict[str, float]):
+        self.probabilities = probabilities
+        self._logprobs = {language: [] for language in probabilities}
+        self._finished = set()
+        self._stopped = set()
+        self._lock = threading.Lock()
+
+    def _score(self, language: str):
+        logprobs = self._logprobs[language]
+        return sum(logprobs) / len(logprobs) if logprobs else None
+
+    def _rank(self, language: str):
+        score = self._score(language)
+        return score if score is not None else float("-inf"), self.probabilities[language]
+
+    def report(self, language: str, segment) -> bool:
+        """Record one decoded segment; returns False once the candidate has lost."""
+        with self._lock:
+            if language in self._stopped:
+                return False
+            self._logprobs[language].append(segment.avg_logprob)
+            self._decide()
+            return language not in self._stopped
+
+    def finish(self, language: str):
+        with self._lock:
+            self._finished.add(language)
+            self._decide()
+
+    def _decide(self):
+        running = [language for language in self._logprobs if language not in self._stopped]
+        # Wait until every candidate has a segment or decoded none at all.
+        if any(self._score(language) is None and language not in self._finished for language in running):
+            return
+        leader = max(running, key=self._rank)
+        for language in running:
+            if language != leader and language not in self._finished:
+                self._stopped.add(language)
+
+    def winner(self, languages: List[str]) -> str:
+        """The best candidate among those whose decode completed."""
+        with self._lock:
+            return max(languages, key=self._rank)
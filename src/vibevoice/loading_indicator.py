@@ -4,15 +4,24 @@ import time
 import os
 import platform
 
+# "true" always shows a desktop notification while a request is processed,
+# "false" never does, and "auto" only when no status widget is listening.
+LOADING_NOTIFICATIONS = os.getenv('LOADING_NOTIFICATIONS', 'auto').lower()
+
 class LoadingIndicator:
-    def __init__(self):
+    def __init__(self, widget_listening=None):
         self._notification_shown = False
         self._stop_event = threading.Event()
         self._thread = None
+        self._widget_listening = widget_listening
         
     def show(self, message="Processing your request..."):
         if self._thread is not None:
             return
+        if LOADING_NOTIFICATIONS == 'false':
+            return
+        if LOADING_NOTIFICATIONS == 'auto' and self._widget_listening is not None and self._widget_listening():
+            return
             
         self._stop_event.clear()
         self._thread = threading.Thread(target=self._show_notification, args=(message,))
@@ -0,0 +1,97 @@
+"""Split long recordings into chunks that decode in parallel, and join the results"""
+
+from typing import List, NamedTuple, Optional, Tuple
+
+
+class ChunkSegment(NamedTuple):
+    """A decoded segment with timestamps in the whole recording."""
+    start: float
+    end: float
+    text: str
+    avg_logprob: Optional[float]
+    temperature: Optional[float]
+
+
+def plan_chunks(total_samples: int, speech: List[dict], chunk_samples: int,
+                overlap_samples: int) -> List[Tuple[int, int]]:
+    """Cut [0, total_samples) into (start, end) chunks of at most chunk_samples.
+
+    Each cut goes into the longest silence between `speech` regions in the
+    second half of the chunk, so no word is split and chunks don't overlap.
+    Without such a silence the chunk is cut at its full length and the next
+    one starts overlap_samples earlier; stitch() removes what both decoded.
+    """
+    chunks = []
+    start = 0
+    while total_samples - start > chunk_samples:
+        earliest, limit = start + chunk_samples // 2, start + chunk_samples
+        cut, longest = None, 0
+        gaps = zip([0] + [region["end"] for region in speech],
+                   [region["start"] for region in speech] + [total_samples])
+        for gap_start, gap_end in gaps:
+            gap_start, gap_end = max(gap_start, earliest), min(gap_end, limit)
+            # The latest of equally long silences, for fewer and longer chunks.
+            if gap_end - gap_start >= longest and gap_end > gap_start:
+                cut, longest = (gap_start + gap_end) // 2, gap_end - gap_start
+        if cut is not None:
+            chunks.append((start, cut))
+            start = cut
+        else:
+            chunks.append((start, limit))
+            start = limit - overlap_samples
+    chunks.append((start, total_samples))
+    return chunks
+
+
+def chunk_speech(speech: List[dict], start: int, end: int) -> List[dict]:
+    """The speech regions inside [start, end), relative to start."""
+    return [
+        {"start": max(region["start"], start) - start, "end": min(region["end"], end) - start}
+        for region in speech if region["end"] > start and region["start"] < end
+    ]
+
+
+def _words(text: str) -> List[str]:
+    """Lowercase words without punctuation, which often differ at a cut."""
+    return [word.strip(".,!?;:").lower() for word in text.split()]
+
+
+def _drop_repeated_words(previous: str, text: str, max_words: int = 10) -> str:
+    """Drop the leading words of `text` that repeat the end of `previous`."""
+    before, after = _words(previous), _words(text)
+    for count in range(min(max_words, len(before), len(after)), 0, -1):
+        if before[-count:] == after[:count]:
+            return " ".join(text.split()[count:])
+    return text
+
+
+def stitch(chunks: List[Tuple[float, float, list]]) -> List[ChunkSegment]:
+    """Join the segments of consecutive chunks, given as (start, end, segments) in seconds.
+
+    Segment timestamps are relative to their chunk. Where two chunks
+    overlap, the earlier chunk keeps the segments starting before the middle
+    of the overlap and the later one those ending after it. Words both
+    decoded around that point are dropped from the later chunk.
+    """
+    stitched = []
+    for index, (chunk_start, chunk_end, segments) in enumerate(chunks):
+        keep_from = float("-inf")
+        if index > 0 and chunk_start < chunks[index - 1][1]:
+            keep_from = (chunk_start + chunks[index - 1][1]) / 2
+        keep_until = float("inf")
+        if index + 1 < len(chunks) and chunks[index + 1][0] < chunk_end:
+            keep_until = (chunks[index + 1][0] + chunk_end) / 2
+
+        first = True
+        for segment in segments:
+            start, end = chunk_start + segment.start, chunk_start + segment.end
+            if end <= keep_from or start >= keep_until:
+                continue
+            text = segment.text.strip()
+            if first and stitched and keep_from > float("-inf"):
+                text = _drop_repeated_words(stitched[-1].text, text)
+            first = False
+            if text:
+                stitched.append(ChunkSegment(start, end, text, getattr(segment, "avg_logprob", None),
+                                             getattr(segment, "temperature", None)))
+    return stitched
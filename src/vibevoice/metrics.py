@@ -0,0 +1,124 @@
+"""Lightweight in-process metrics for the transcription server"""
+
+import bisect
+import threading
+
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.0, 5.0, 10.0, 30.0, 60.0)
+STAGE_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+AUDIO_BUCKETS = (1.0, 2.0, 5.0, 10.0, 20.0, 30.0, 60.0, 120.0, 300.0)
+RTF_BUCKETS = (0.05, 0.1, 0.2, 0.3, 0.5, 0.75, 1.0, 1.5, 2.0, 5.0)
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32)
+
+
+class Histogram:
+    """Fixed-bucket histogram, safe to observe from worker threads."""
+
+    def __init__(self, buckets):
+        self.buckets = tuple(sorted(buckets))
+        self._counts = [0] * (len(self.buckets) + 1)
+        self._count = 0
+        self._sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self._counts[index] += 1
+            self._count += 1
+            self._sum += value
+
+    def snapshot(self) -> dict:
+        """Return count, sum and cumulative bucket counts keyed by upper bound."""
+        with self._lock:
+            counts = list(self._counts)
+            count, total = self._count, self._sum
+
+        cumulative = {}
+        running = 0
+        for bound, bucket_count in zip(self.buckets, counts):
+            running += bucket_count
+            cumulative[str(bound)] = running
+        cumulative["+Inf"] = count
+        return {"count": count, "sum": round(total, 6), "buckets": cumulative}
+
+
+class Counter:
+    """Monotonic counters keyed by a label value, safe to use from worker threads."""
+
+    def __init__(self):
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, label: str, amount: float = 1):
+        with self._lock:
+            self._values[label] = self._values.get(label, 0) + amount
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return dict(self._values)
+
+
+class LabeledHistogram:
+    """One Histogram per label value, created on first observation."""
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self._histograms = {}
+        self._lock = threading.Lock()
+
+    def observe(self, label: str, value: float):
+        with self._lock:
+            histogram = self._histograms.get(label)
+            if histogram is None:
+                histogram = self._histograms[label] = Histogram(self.buckets)
+        histogram.observe(value)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            histograms = dict(self._histograms)
+        return {label: histogram.snapshot() for label, histogram in histograms.items()}
+
+
+def _format_labels(labels: dict) -> str:
+    if not labels:
+        return ""
+    pairs = ",".join(
+        '{}="{}"'.format(name, str(value).replace("\\", "\\\\").replace('"', '\\"'))
+        for name, value in labels.items()
+    )
+    return "{" + pairs + "}"
+
+
+class PrometheusText:
+    """Build a scrape response in the Prometheus text exposition format."""
+
+    def __init__(self):
+        self._lines = []
+        self._declared = set()
+
+    def _declare(self, name: str, metric_type: str, help_text: str):
+        if name not in self._declared:
+            self._declared.add(name)
+            self._lines.append(f"# HELP {name} {help_text}")
+            self._lines.append(f"# TYPE {name} {metric_type}")
+
+    def gauge(self, name: str, help_text: str, value, **labels):
+        self._declare(name, "gauge", help_text)
+        self._lines.append(f"{name}{_format_labels(labels)} {value}")
+
+    def counter(self, name: str, help_text: str, value, **labels):
+        # HELP/TYPE must name the _total samples, or parsers read them as untyped
+        name = f"{name}_total"
+        self._declare(name, "counter", help_text)
+        self._lines.append(f"{name}{_format_labels(labels)} {value}")
+
+    def histogram(self, name: str, help_text: str, snapshot: dict, **labels):
+        """Add a Histogram.snapshot() as _bucket, _sum and _count samples."""
+        self._declare(name, "histogram", help_text)
+        for bound, count in snapshot["buckets"].items():
+            self._lines.append(f"{name}_bucket{_format_labels({**labels, 'le': bound})} {count}")
+        self._lines.append(f"{name}_sum{_format_labels(labels)} {snapshot['sum']}")
+        self._lines.append(f"{name}_count{_format_labels(labels)} {snapshot['count']}")
+
+    def render(self) -> str:
+        return "\n".join(self._lines) + "\n"
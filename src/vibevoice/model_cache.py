@@ -0,0 +1,205 @@
+"""Memory-budgeted LRU cache for loaded Whisper models"""
+
+import os
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+
+def _rss_bytes() -> int:
+    """Resident set size of this process, or 0 where /proc is unavailable."""
+    try:
+        with open("/proc/self/statm") as statm:
+            return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return 0
+
+
+class _Entry:
+    def __init__(self, model, size_bytes):
+        self.model = model
+        self.size_bytes = size_bytes
+        self.last_used = time.time()
+        self.pinned = False
+        self.in_use = 0
+
+
+class ModelCache:
+    """LRU cache of loaded models with a RAM budget and idle unloading.
+
+    The size of each model is the growth in process RSS while it loads, so
+    CUDA models count only their host-side footprint. When the total exceeds
+    `budget_bytes` (0 = unlimited), least recently used models are unloaded
+    until it fits again. Pinned models and models that are serving a request
+    are never unloaded. `on_evict(key, model)` is called after a model is
+    dropped, outside the cache lock.
+    """
+
+    def __init__(self, budget_bytes: int = 0, idle_timeout: float = 0, on_evict=None):
+        self.budget_bytes = budget_bytes
+        self.idle_timeout = idle_timeout
+        self.on_evict = on_evict
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._known_sizes = {}
+        self._lock = threading.Lock()
+        self._load_lock = threading.Lock()
+
+    def __contains__(self, key) -> bool:
+        with self._lock:
+            return key in self._entries
+
+    def items(self):
+        with self._lock:
+            return [(key, entry.model) for key, entry in self._entries.items()]
+
+    def key_of(self, model):
+        """Return the cache key of a loaded model."""
+        with self._lock:
+            for key, entry in self._entries.items():
+                if entry.model is model:
+                    return key
+        raise KeyError("Model is not in the model cache")
+
+    def record_hit(self):
+        """Count a lookup answered by a model that was already loaded, outside get_or_load."""
+        with self._lock:
+            self.hits += 1
+
+    def get_or_load(self, key, loader, pinned: bool = False):
+        """Return the cached model for `key`, calling loader() to load it if needed.
+
+        A pinned model (e.g. the default model) is never evicted. It is pinned
+        as it enters the cache, before making room could unload it again.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self.hits += 1
+                entry.pinned = entry.pinned or pinned
+                self._entries.move_to_end(key)
+                return entry.model
+
+        # Loads are serialized so the RSS growth can be attributed to one model.
+        with self._load_lock:
+            with self._lock:
+                entry = self._entries.get(key)
+                if entry is not None:
+                    # Loaded by another thread meanwhile.
+                    self.hits += 1
+                    entry.pinned = entry.pinned or pinned
+                    return entry.model
+                self.misses += 1
+                evicted = self._make_room(self._known_sizes.get(key, 0))
+            self._notify(evicted)
+
+            before = _rss_bytes()
+            model = loader()
+            size_bytes = max(_rss_bytes() - before, 0)
+
+            with self._lock:
+                self._entries[key] = _Entry(model, size_bytes)
+                self._entries[key].pinned = pinned
+                self._known_sizes[key] = size_bytes
+                evicted = self._make_room(0)
+            self._notify(evicted)
+            return model
+
+    @contextmanager
+    def using(self, key):
+        """Mark a model as serving a request so it cannot be evicted meanwhile."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                raise KeyError(f"Model {key} is no longer loaded")
+            entry.in_use += 1
+            entry.last_used = time.time()
+            self._entries.move_to_end(key)
+        try:
+            yield entry.model
+        finally:
+            with self._lock:
+                entry.in_use -= 1
+                entry.last_used = time.time()
+
+    def evict_idle(self):
+        """Unload unpinned models that have not been used for idle_timeout seconds."""
+        if self.idle_timeout <= 0:
+            return
+        cutoff = time.time() - self.idle_timeout
+        with self._lock:
+            idle = [
+                key for key, entry in self._entries.items()
+                if not entry.pinned and not entry.in_use and entry.last_used < cutoff
+            ]
+            evicted = [(key, self._remove(key)) for key in idle]
+        self._notify(evicted)
+
+    def _used_bytes(self) -> int:
+        return sum(entry.size_bytes for entry in self._entries.values())
+
+    def _make_room(self, incoming_bytes):
+        """Evict LRU models until incoming_bytes fits in the budget. Caller holds the lock."""
+        evicted = []
+        if self.budget_bytes <= 0:
+            return evicted
+        for key in list(self._entries):
+            if self._used_bytes() + incoming_bytes <= self.budget_bytes:
+                break
+            entry = self._entries[key]
+            if entry.pinned or entry.in_use:
+                continue
+            evicted.append((key, self._remove(key)))
+        if self._used_bytes() + incoming_bytes > self.budget_bytes:
+            print(
+                f"Model cache is over its budget ({self._used_bytes() // 2**20} MB used, "
+                f"{self.budget_bytes // 2**20} MB allowed); remaining models are pinned or busy"
+            )
+        return evicted
+
+    def _remove(self, key):
+        entry = self._entries.pop(key)
+        self.evictions += 1
+        return entry.model
+
+    def _notify(self, evicted):
+        for key, model in evicted:
+            print(f"Unloaded Whisper model '{key[0]}' on {key[1]} (compute={key[2]})")
+            # Release the CTranslate2 weights even if a stale reference survives somewhere.
+            try:
+                model.model.unload_model()
+            except Exception:
+                pass
+            if self.on_evict is not None:
+                self.on_evict(key, model)
+
+    def stats(self) -> dict:
+        with self._lock:
+            now = time.time()
+            models = [
+                {
+                    "model": key[0],
+                    "device": key[1],
+                    "compute_type": key[2],
+                    "size_mb": round(entry.size_bytes / 2**20),
+                    "idle_seconds": int(now - entry.last_used),
+                    "pinned": entry.pinned,
+                    "in_use": entry.in_use,
+                }
+                for key, entry in self._entries.items()
+            ]
+            used_bytes = self._used_bytes()
+        lookups = self.hits + self.misses
+        return {
+            "budget_mb": self.budget_bytes // 2**20,
+            "used_mb": round(used_bytes / 2**20),
+            "idle_timeout_seconds": self.idle_timeout,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else None,
+            "models": models,
+        }
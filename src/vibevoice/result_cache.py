@@ -0,0 +1,87 @@
+"""Content-addressed cache of transcription results"""
+
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+
+def audio_fingerprint(audio) -> str:
+    """SHA-256 of the PCM samples, or of the file contents for a file path."""
+    digest = hashlib.sha256()
+    if isinstance(audio, str):
+        with open(audio, "rb") as audio_file:
+            for block in iter(lambda: audio_file.read(1 << 20), b""):
+                digest.update(block)
+    else:
+        digest.update(memoryview(np.ascontiguousarray(audio, dtype=np.float32)).cast("B"))
+    return digest.hexdigest()
+
+
+class ResultCache:
+    """LRU cache of transcription results with a per-entry time to live.
+
+    Keys combine the audio fingerprint, the model_cache key and every
+    decode option that can change the text, so a hit is only returned for
+    the same audio decoded the same way. Requests that share the result of
+    an identical decode still in flight are counted as joins, and the hit
+    rate counts them as reuse.
+    """
+
+    def __init__(self, max_entries: int = 128, ttl_seconds: float = 600):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self.joins = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] < time.monotonic():
+                del self._entries[key]
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._entries.move_to_end(key)
+            return dict(entry[1])
+
+    def record_join(self):
+        """Count a request answered by an identical decode that was in flight."""
+        with self._lock:
+            self.joins += 1
+
+    def put(self, key, result: dict):
+        if not self.enabled:
+            return
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl_seconds, dict(result))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def stats(self) -> dict:
+        with self._lock:
+            entries = len(self._entries)
+        reused = self.hits + self.joins
+        lookups = reused + self.misses
+        return {
+            "enabled": self.enabled,
+            "entries": entries,
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl_seconds,
+            "hits": self.hits,
+            "misses": self.misses,
+            "joins": self.joins,
+            "hit_rate": round(reused / lookups, 3) if lookups else None,
+        }
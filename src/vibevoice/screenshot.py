@@ -0,0 +1,112 @@
+"""Screen capture and in-memory image encoding for AI command mode"""
+
+import base64
+import hashlib
+import io
+import os
+import threading
+import time
+
+SCREENSHOT_AVAILABLE = False
+try:
+    import pyautogui
+    from PIL import Image
+    SCREENSHOT_AVAILABLE = True
+except ImportError as e:
+    print(f"Screenshot functionality not available: {e}")
+    print("Install Pillow with: pip install Pillow")
+
+# Pillow format names and the encoder options of each supported format.
+FORMATS = {
+    "png": ("PNG", lambda quality: {"compress_level": 1}),
+    "jpeg": ("JPEG", lambda quality: {"quality": quality}),
+    "webp": ("WEBP", lambda quality: {"quality": quality, "method": 0}),
+}
+
+# Width of the thumbnail whose hash decides whether the screen changed.
+FINGERPRINT_WIDTH = 160
+
+_cache_lock = threading.Lock()
+_cache = {"key": None, "data": None}
+
+
+def _settings():
+    image_format = os.getenv('SCREENSHOT_FORMAT', 'jpeg').lower()
+    if image_format not in FORMATS:
+        print(f"Unknown SCREENSHOT_FORMAT '{image_format}', using jpeg")
+        image_format = 'jpeg'
+    return (
+        image_format,
+        int(os.getenv('SCREENSHOT_QUALITY', '80')),
+        int(os.getenv('SCREENSHOT_MAX_WIDTH', '1024')),
+        os.getenv('SCREENSHOT_FAST_RESIZE', 'true').lower() == 'true',
+    )
+
+
+def _fingerprint(screenshot) -> str:
+    """Hash of a box-filtered thumbnail; equal hashes mean an unchanged screen."""
+    factor = max(1, screenshot.width // FINGERPRINT_WIDTH)
+    return hashlib.blake2b(screenshot.reduce(factor).tobytes(), digest_size=16).hexdigest()
+
+
+def _resize(screenshot, max_width: int, fast: bool):
+    width, height = screenshot.size
+    if width <= max_width:
+        return screenshot
+    new_size = (max_width, int(height * max_width / width))
+    if fast:
+        # Integer box downscale first; it is much cheaper than a filtered resize
+        # of the full frame and leaves only a small step for the final resize.
+        factor = width // max_width
+        if factor > 1:
+            screenshot = screenshot.reduce(factor)
+        return screenshot.resize(new_size, Image.BILINEAR)
+    return screenshot.resize(new_size, Image.LANCZOS)
+
+
+def capture_screenshot():
+    """Capture the screen and return it base64-encoded, or None on failure.
+
+    The image is resized and encoded in memory. When the screen looks the
+    same as at the previous capture (same thumbnail hash and settings), the
+    previous encoding is returned without resizing or encoding again.
+    """
+    if not SCREENSHOT_AVAILABLE:
+        print("Screenshot functionality not available. Install Pillow with: pip install Pillow")
+        return None
+
+    try:
+        image_format, quality, max_width, fast = _settings()
+        started = time.perf_counter()
+        screenshot = pyautogui.screenshot()
+        captured = time.perf_counter()
+
+        key = (_fingerprint(screenshot), image_format, quality, max_width, fast)
+        hashed = time.perf_counter()
+        with _cache_lock:
+            if _cache["key"] == key:
+                print(f"Screenshot unchanged; reusing the last encoding "
+                      f"(capture {(captured - started) * 1000:.0f} ms, hash {(hashed - captured) * 1000:.0f} ms)")
+                return _cache["data"]
+
+        screenshot = _resize(screenshot, max_width, fast)
+        if image_format != 'png':
+            screenshot = screenshot.convert('RGB')
+        resized = time.perf_counter()
+
+        pillow_format, options = FORMATS[image_format]
+        buffer = io.BytesIO()
+        screenshot.save(buffer, format=pillow_format, **options(quality))
+        base64_data = base64.b64encode(buffer.getbuffer()).decode('ascii')
+        encoded = time.perf_counter()
+
+        with _cache_lock:
+            _cache.update(key=key, data=base64_data)
+        print(f"Screenshot {screenshot.width}x{screenshot.height} {image_format}, "
+              f"{buffer.tell() // 1024} KB: capture {(captured - started) * 1000:.0f} ms, "
+              f"hash {(hashed - captured) * 1000:.0f} ms, resize {(resized - hashed) * 1000:.0f} ms, "
+              f"encode {(encoded - resized) * 1000:.0f} ms")
+        return base64_data
+    except Exception as e:
+        print(f"Error capturing screenshot: {e}")
+        return None
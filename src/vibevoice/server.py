@@ -1,13 +1,54 @@
 """FastAPI server for Whisper transcription"""
 
 import uvicorn
+import asyncio
+import bisect
+import json
 import os
+import socket
+import threading
 import time
+import uuid
+import numpy as np
+from concurrent.futures import Future, ThreadPoolExecutor
 from datetime import datetime, timedelta
-from fastapi import FastAPI
-from pydantic import BaseModel
-from faster_whisper import WhisperModel
-from typing import Dict, Tuple
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from pydantic import BaseModel, ValidationError
+from faster_whisper import BatchedInferencePipeline, WhisperModel, decode_audio
+from faster_whisper.transcribe import restore_speech_timestamps
+from faster_whisper.vad import VadOptions, collect_chunks, get_speech_timestamps, get_vad_model
+from typing import Dict, List, Optional, Tuple
+
+from batching import BatchScheduler
+from cpu_tuning import available_cores, calibrate, load_tuning, save_tuning
+from events import EventBroker
+from inference import InferencePool, QueueFullError
+from language_detection import LanguageRace, LanguageSessions, candidate_probabilities
+from long_form import ChunkSegment, chunk_speech, plan_chunks, stitch
+from instrumentation import (
+    RequestTimings,
+    activate,
+    current_timings,
+    install_module_hooks,
+    instrument_model,
+    stage,
+    temperature_label,
+)
+from server_runtime import SERVER_SOCKET_PATH, ReadinessNotifier, acquire_server_lock
+from metrics import (
+    AUDIO_BUCKETS,
+    LATENCY_BUCKETS,
+    RTF_BUCKETS,
+    STAGE_BUCKETS,
+    Counter,
+    Histogram,
+    LabeledHistogram,
+    PrometheusText,
+)
+from model_cache import ModelCache
+from result_cache import ResultCache, audio_fingerprint
+from streaming import SAMPLE_RATE, StreamingTranscriber
 
 app = FastAPI()
 
@@ -24,19 +65,241 @@ WHISPER_COMPUTE_CPU = os.getenv("WHISPER_COMPUTE_CPU", "int8")
 # Swedish-specific model override (falls back to GPU/CPU defaults if unset).
 WHISPER_MODEL_SWEDISH = os.getenv("WHISPER_MODEL_SWEDISH", "KBLab/kb-whisper-large")
 
-model_cache: Dict[Tuple[str, str, str], WhisperModel] = {}
+# Streaming transcription: decode the live buffer every STREAM_STEP_SECONDS of new
+# audio and hold back the last STREAM_HOLDBACK_SECONDS until they stabilize.
+STREAM_STEP_SECONDS = float(os.getenv("STREAM_STEP_SECONDS", "1.0"))
+STREAM_HOLDBACK_SECONDS = float(os.getenv("STREAM_HOLDBACK_SECONDS", "1.0"))
+
+# Raw PCM sample formats accepted by the PCM endpoints: (dtype, scale to [-1, 1]).
+PCM_FORMATS = {
+    "f32le": (np.dtype("<f4"), 1.0),
+    "s16le": (np.dtype("<i2"), float(np.iinfo(np.int16).max)),
+}
+
+# Inference runs on a worker pool per loaded model. WHISPER_CONCURRENCY sets the
+# parallel decodes per model (also passed to CTranslate2 as num_workers) and
+# WHISPER_QUEUE_SIZE how many more requests may wait before new ones get a 429.
+WHISPER_CONCURRENCY = int(os.getenv("WHISPER_CONCURRENCY", "1"))
+WHISPER_QUEUE_SIZE = int(os.getenv("WHISPER_QUEUE_SIZE", "8"))
+
+# State changes (server readiness, model loading, backend fallback, inference
+# activity and queue depth) are pushed to subscribers of /events.
+events = EventBroker()
+
+
+def _publish_inference(active: int, queued: int):
+    events.publish("inference", {"active": active, "queued": queued})
+
+
+def _publish_request_stage(request_id: str, stage: str, **data):
+    """Publish one lifecycle stage of a request (the CLI publishes its own stages too)."""
+    events.publish("request", {"request_id": request_id, "stage": stage, "source": "server", **data})
+
+
+inference_pool = InferencePool(
+    concurrency=WHISPER_CONCURRENCY, max_queue=WHISPER_QUEUE_SIZE, on_change=_publish_inference
+)
+
+# Micro-batching for servers shared by several clients: requests with compatible
+# options that arrive within WHISPER_BATCH_WINDOW_MS are decoded together through
+# faster-whisper's batched pipeline. 0 (the default) disables batching. This covers
+# /transcribe/ and /transcribe/pcm, including segment streams (whose text then only
+# arrives as a whole); the tail decoded after a /transcribe/stream upload is never
+# batched.
+WHISPER_BATCH_WINDOW_MS = int(os.getenv("WHISPER_BATCH_WINDOW_MS", "0"))
+WHISPER_BATCH_MAX_SIZE = int(os.getenv("WHISPER_BATCH_MAX_SIZE", "8"))
+WHISPER_WINDOW_SECONDS = 30
+
+# Recordings longer than WHISPER_LONG_FORM_SECONDS are cut at silences into chunks
+# of at most WHISPER_LONG_FORM_CHUNK_SECONDS, decoded in parallel on the model's
+# workers (so only for models with more than one) and joined again. Chunks cut
+# without a silence overlap by WHISPER_LONG_FORM_OVERLAP_SECONDS. 0 disables it.
+WHISPER_LONG_FORM_SECONDS = float(os.getenv("WHISPER_LONG_FORM_SECONDS", "60"))
+WHISPER_LONG_FORM_CHUNK_SECONDS = float(os.getenv("WHISPER_LONG_FORM_CHUNK_SECONDS", "30"))
+WHISPER_LONG_FORM_OVERLAP_SECONDS = float(os.getenv("WHISPER_LONG_FORM_OVERLAP_SECONDS", "2"))
+
+request_latency = Histogram(LATENCY_BUCKETS)
+
+# Where the time of each request goes: queue wait, audio decode, VAD, features,
+# encode, decode per temperature and segment filtering. Served on /metrics.
+install_module_hooks()
+stage_seconds = LabeledHistogram(STAGE_BUCKETS)
+decode_seconds = LabeledHistogram(STAGE_BUCKETS)
+audio_duration = Histogram(AUDIO_BUCKETS)
+real_time_factor = Histogram(RTF_BUCKETS)
+
+# A decoded window falls back to the next temperature when its compression ratio
+# exceeds this (repetition loops) or its avg_logprob is below log_prob_threshold.
+COMPRESSION_RATIO_THRESHOLD = float(os.getenv("WHISPER_COMPRESSION_RATIO_THRESHOLD", "2.4"))
+
+# How often each fallback temperature was needed, per segment and per request
+# (a request counts at the highest temperature any of its segments needed).
+fallback_segments = Counter()
+fallback_requests = Counter()
+
+# Results are cached by audio fingerprint and decode options, so client retries
+# and re-sent clips skip decoding. TRANSCRIPT_CACHE_SIZE=0 disables the cache.
+TRANSCRIPT_CACHE_SIZE = int(os.getenv("TRANSCRIPT_CACHE_SIZE", "128"))
+TRANSCRIPT_CACHE_TTL_SECONDS = float(os.getenv("TRANSCRIPT_CACHE_TTL_SECONDS", "600"))
+
+result_cache = ResultCache(max_entries=TRANSCRIPT_CACHE_SIZE, ttl_seconds=TRANSCRIPT_CACHE_TTL_SECONDS)
+inflight_transcriptions: Dict[tuple, asyncio.Future] = {}
+
+# language="auto" detects the language once on the first 30 s of speech and sends
+# the request to that language's model. When no language in WHISPER_AUTO_LANGUAGES
+# reaches WHISPER_AUTO_CONFIDENCE, the two likeliest are decoded in parallel and
+# the weaker transcript is stopped early. WHISPER_AUTO_DETECT_LANGUAGE picks the
+# model that detects (empty = the default model). A detected language is reused
+# for the client's session_id during WHISPER_AUTO_SESSION_SECONDS (0 = never).
+AUTO_LANGUAGE = "auto"
+WHISPER_AUTO_LANGUAGES = [
+    language.strip() for language in os.getenv("WHISPER_AUTO_LANGUAGES", "en,sv").split(",") if language.strip()
+]
+WHISPER_AUTO_CONFIDENCE = float(os.getenv("WHISPER_AUTO_CONFIDENCE", "0.8"))
+WHISPER_AUTO_DETECT_LANGUAGE = os.getenv("WHISPER_AUTO_DETECT_LANGUAGE", "") or None
+WHISPER_AUTO_SESSION_SECONDS = float(os.getenv("WHISPER_AUTO_SESSION_SECONDS", "300"))
+
+language_sessions = LanguageSessions(ttl_seconds=WHISPER_AUTO_SESSION_SECONDS)
+
+# Loaded models are kept in an LRU cache. WHISPER_CACHE_BUDGET_MB caps their RAM
+# footprint (0 = unlimited) and WHISPER_IDLE_UNLOAD_SECONDS unloads models unused
+# for that long (0 = never). The default model is pinned and never unloaded.
+WHISPER_CACHE_BUDGET_MB = int(os.getenv("WHISPER_CACHE_BUDGET_MB", "0"))
+WHISPER_IDLE_UNLOAD_SECONDS = float(os.getenv("WHISPER_IDLE_UNLOAD_SECONDS", "0"))
+
+
+def _on_model_evicted(cache_key: Tuple[str, str, str], model_instance: WhisperModel):
+    """Forget every reference to an unloaded model so its memory is released."""
+    inference_pool.shutdown(cache_key)
+    with model_state_lock:
+        for slot, future in list(model_futures.items()):
+            if future.done() and future.exception() is None and future.result() is model_instance:
+                del model_futures[slot]
+                _update_model_state(slot, state="unloaded")
+
+
+model_cache = ModelCache(
+    budget_bytes=WHISPER_CACHE_BUDGET_MB * 2**20,
+    idle_timeout=WHISPER_IDLE_UNLOAD_SECONDS,
+    on_evict=_on_model_evicted,
+)
+
+# CPU models use the cpu_threads/num_workers stored by an earlier calibration of
+# this host. WHISPER_CPU_CALIBRATE=true measures them on first load when nothing
+# is stored ("force" re-measures on every start); the calibrated num_workers also
+# becomes the model's parallel decodes, up to WHISPER_CPU_MAX_WORKERS.
+# WHISPER_CPU_RESERVED_CORES are left free for other work such as Ollama.
+WHISPER_CPU_CALIBRATE = os.getenv("WHISPER_CPU_CALIBRATE", "false").lower()
+WHISPER_CPU_RESERVED_CORES = int(os.getenv("WHISPER_CPU_RESERVED_CORES", "0"))
+WHISPER_CPU_MAX_WORKERS = int(os.getenv("WHISPER_CPU_MAX_WORKERS", "2"))
+
+cpu_tuning_applied: Dict[str, dict] = {}
 
 
-def load_model(model_name: str, device: str, compute_type: str) -> WhisperModel:
-    """Load (or reuse) a Whisper model for the requested configuration."""
+def _cpu_settings(model_name: str, compute_type: str) -> Tuple[int, int]:
+    """Return (cpu_threads, num_workers) for a CPU model, calibrating if enabled."""
+    cores = max(1, available_cores() - WHISPER_CPU_RESERVED_CORES)
+    tuning = None if WHISPER_CPU_CALIBRATE == "force" else load_tuning(model_name, compute_type, cores)
+    source = "stored"
+    if tuning is None and WHISPER_CPU_CALIBRATE in ("true", "force"):
+        print(f"Calibrating CPU threads and workers for '{model_name}' (compute={compute_type}) on {cores} cores")
+
+        def load_candidate(cpu_threads, num_workers):
+            return WhisperModel(model_name, device="cpu", compute_type=compute_type,
+                                cpu_threads=cpu_threads, num_workers=num_workers)
+
+        tuning = calibrate(load_candidate, model_name, compute_type, cores, WHISPER_CPU_MAX_WORKERS)
+        save_tuning(model_name, compute_type, tuning)
+        source = "calibrated"
+
+    if tuning is None:
+        # CTranslate2 picks its own thread count for cpu_threads=0.
+        tuning = {"cpu_threads": 0, "num_workers": WHISPER_CONCURRENCY, "cores": cores}
+        source = "default"
+    cpu_tuning_applied[f"{model_name}/{compute_type}"] = {
+        "source": source,
+        **{key: value for key, value in tuning.items() if key != "candidates"},
+    }
+    return tuning["cpu_threads"], tuning["num_workers"]
+
+
+def load_model(model_name: str, device: str, compute_type: str, pinned: bool = False) -> WhisperModel:
+    """Load (or reuse) a Whisper model for the requested configuration; pinned ones are never unloaded."""
     cache_key = (model_name, device, compute_type)
-    if cache_key in model_cache:
-        return model_cache[cache_key]
+    cpu_threads, num_workers = 0, WHISPER_CONCURRENCY
+    if device == "cpu" and cache_key not in model_cache:
+        # Calibration loads its own models, so it runs before the cache measures this one.
+        cpu_threads, num_workers = _cpu_settings(model_name, compute_type)
 
-    print(f"Loading Whisper model '{model_name}' on {device} (compute={compute_type})")
-    model_instance = WhisperModel(model_name, device=device, compute_type=compute_type)
-    model_cache[cache_key] = model_instance
-    return model_instance
+    def load():
+        print(f"Loading Whisper model '{model_name}' on {device} (compute={compute_type}, "
+              f"cpu_threads={cpu_threads or 'auto'}, num_workers={num_workers})")
+        model_instance = instrument_model(WhisperModel(
+            model_name,
+            device=device,
+            compute_type=compute_type,
+            cpu_threads=cpu_threads,
+            num_workers=num_workers,
+        ))
+        inference_pool.set_concurrency(cache_key, num_workers)
+        return model_instance
+
+    return model_cache.get_or_load(cache_key, load, pinned=pinned)
+
+
+def model_key(model_instance: WhisperModel) -> Tuple[str, str, str]:
+    """Return the model_cache key of a loaded model."""
+    return model_cache.key_of(model_instance)
+
+
+def _model_unloaded() -> HTTPException:
+    return HTTPException(status_code=503, detail="Whisper model was unloaded; retry the request",
+                         headers={"Retry-After": "1"})
+
+
+def request_model_key(model_instance: WhisperModel) -> Tuple[str, str, str]:
+    """model_key() while serving a request; a model unloaded since it was looked up is a 503."""
+    try:
+        return model_key(model_instance)
+    except KeyError:
+        raise _model_unloaded()
+
+
+async def run_inference(model_instance: WhisperModel, fn, *args, timings: RequestTimings = None,
+                        publish_for: Optional[List[str]] = None):
+    """Run blocking inference for a model on its worker pool.
+
+    Raises a 429 when the model's queue is full, so the event loop keeps
+    serving /health and /status while decodes are running. With `timings`,
+    the wait for a worker and every stage run by fn are recorded into it,
+    and "queued" and "decoding" are published for the requests in
+    `publish_for` (by default timings.request_id; [] publishes nothing).
+    """
+    submitted = time.perf_counter()
+    if publish_for is None:
+        publish_for = [timings.request_id] if timings is not None else []
+
+    def job():
+        if timings is None:
+            return fn(*args)
+        queue_wait = time.perf_counter() - submitted
+        timings.add("queue_wait", queue_wait)
+        for request_id in publish_for:
+            _publish_request_stage(request_id, "decoding", queue_wait_ms=round(queue_wait * 1000))
+        with activate(timings), timings.stage("inference"):
+            return fn(*args)
+
+    try:
+        cache_key = model_key(model_instance)
+        for request_id in publish_for:
+            _publish_request_stage(request_id, "queued", backend=cache_key[1])
+        with model_cache.using(cache_key):
+            return await inference_pool.run(cache_key, job)
+    except QueueFullError as e:
+        raise HTTPException(status_code=429, detail=f"Transcription queue is full: {e}",
+                            headers={"Retry-After": "1"})
+    except KeyError:
+        raise _model_unloaded()
 
 
 whisper_backend = None
@@ -45,94 +308,204 @@ whisper_compute_type = None
 primary_model = None
 language_model_runtime: Dict[str, Dict[str, str]] = {}
 
-try:
-    primary_model = load_model(WHISPER_SIZE_GPU, device="cuda", compute_type=WHISPER_COMPUTE_GPU)
-    whisper_backend = "cuda"
-    whisper_model_size = WHISPER_SIZE_GPU
-    whisper_compute_type = WHISPER_COMPUTE_GPU
-except Exception as e:
-    # Log and fall back to CPU so the app remains usable after suspend
-    print(
-        f"Failed to initialize Whisper on CUDA ({e}). Falling back to CPU: "
-        f"size={WHISPER_SIZE_CPU}, compute_type={WHISPER_COMPUTE_CPU}"
-    )
-    primary_model = load_model(WHISPER_SIZE_CPU, device="cpu", compute_type=WHISPER_COMPUTE_CPU)
-    whisper_backend = "cpu"
-    whisper_model_size = WHISPER_SIZE_CPU
-    whisper_compute_type = WHISPER_COMPUTE_CPU
-
-language_model_runtime["default"] = {
-    "backend": whisper_backend,
-    "size": whisper_model_size,
-    "compute_type": whisper_compute_type,
+# Languages whose models are loaded in the background at startup, e.g. "sv".
+WHISPER_PRELOAD_LANGUAGES = [
+    language.strip() for language in os.getenv("WHISPER_PRELOAD_LANGUAGES", "").split(",") if language.strip()
+]
+
+# Models load on a background executor so the port binds immediately. Each
+# language slot moves through loading -> ready (or failed, retried on next use),
+# and requests for a slot that is still loading wait for it instead of failing.
+model_loader = ThreadPoolExecutor(max_workers=2, thread_name_prefix="model-loader")
+model_futures: Dict[str, Future] = {}
+model_state_lock = threading.Lock()
+
+
+def _update_model_state(slot: str, **fields):
+    """Update a language slot's entry in /status and publish it as a "model" event."""
+    state = language_model_runtime.setdefault(slot, {})
+    state.update(fields)
+    events.publish("model", {"slot": slot, **state}, key=slot)
+
+
+def _load_default_model() -> WhisperModel:
+    global primary_model, whisper_backend, whisper_model_size, whisper_compute_type
+    try:
+        model_instance = load_model(WHISPER_SIZE_GPU, device="cuda", compute_type=WHISPER_COMPUTE_GPU,
+                                    pinned=True)
+        backend, size, compute_type = "cuda", WHISPER_SIZE_GPU, WHISPER_COMPUTE_GPU
+    except Exception as e:
+        # Log and fall back to CPU so the app remains usable after suspend
+        print(
+            f"Failed to initialize Whisper on CUDA ({e}). Falling back to CPU: "
+            f"size={WHISPER_SIZE_CPU}, compute_type={WHISPER_COMPUTE_CPU}"
+        )
+        events.publish("backend_fallback", {"slot": "default", "from": "cuda", "to": "cpu", "error": str(e)},
+                       key="default")
+        model_instance = load_model(WHISPER_SIZE_CPU, device="cpu", compute_type=WHISPER_COMPUTE_CPU,
+                                    pinned=True)
+        backend, size, compute_type = "cpu", WHISPER_SIZE_CPU, WHISPER_COMPUTE_CPU
+
+    primary_model = model_instance
+    whisper_backend, whisper_model_size, whisper_compute_type = backend, size, compute_type
+    _update_model_state("default", backend=backend, size=size, compute_type=compute_type)
+    return model_instance
+
+
+def _load_swedish_model() -> WhisperModel:
+    # Prefer the currently active backend (GPU if available), fall back to CPU otherwise.
+    preferred_device = whisper_backend or "cuda"
+    preferred_compute = whisper_compute_type if whisper_backend != "cpu" else WHISPER_COMPUTE_CPU
+    if preferred_device == "cuda" and not whisper_compute_type:
+        preferred_compute = WHISPER_COMPUTE_GPU
+
+    try:
+        swedish_model = load_model(
+            WHISPER_MODEL_SWEDISH,
+            device=preferred_device,
+            compute_type=preferred_compute,
+        )
+        _update_model_state(
+            "sv", backend=preferred_device, size=WHISPER_MODEL_SWEDISH, compute_type=preferred_compute
+        )
+        return swedish_model
+    except Exception as e:
+        print(
+            f"Failed to load Swedish model on {preferred_device} ({preferred_compute}): {e}. "
+            "Retrying on CPU."
+        )
+        events.publish("backend_fallback", {"slot": "sv", "from": preferred_device, "to": "cpu", "error": str(e)},
+                       key="sv")
+        swedish_model_cpu = load_model(
+            WHISPER_MODEL_SWEDISH,
+            device="cpu",
+            compute_type=WHISPER_COMPUTE_CPU,
+        )
+        _update_model_state(
+            "sv", backend="cpu", size=WHISPER_MODEL_SWEDISH, compute_type=WHISPER_COMPUTE_CPU
+        )
+        return swedish_model_cpu
+
+
+MODEL_LOADERS = {
+    "default": _load_default_model,
+    "sv": _load_swedish_model,
 }
 
 
-def get_model_for_language(language: str | None) -> WhisperModel:
-    """Return a Whisper model suited for the requested language."""
+def _language_slot(language: str | None) -> str:
     if language and language.lower().startswith("sv"):
-        runtime_override = language_model_runtime.get("sv")
-        if runtime_override:
-            backend = runtime_override.get("backend", whisper_backend or "cuda")
-            compute = runtime_override.get("compute_type", whisper_compute_type or WHISPER_COMPUTE_CPU)
-            return load_model(
-                runtime_override.get("size", WHISPER_MODEL_SWEDISH),
-                device=backend,
-                compute_type=compute,
-            )
+        return "sv"
+    return "default"
 
-        # Prefer the currently active backend (GPU if available), fall back to CPU otherwise.
-        preferred_device = whisper_backend or "cuda"
-        preferred_compute = whisper_compute_type if whisper_backend != "cpu" else WHISPER_COMPUTE_CPU
 
-        try:
-            swedish_model = load_model(
-                WHISPER_MODEL_SWEDISH,
-                device=preferred_device,
-                compute_type=preferred_compute,
-            )
-            language_model_runtime["sv"] = {
-                "backend": preferred_device,
-                "size": WHISPER_MODEL_SWEDISH,
-                "compute_type": preferred_compute,
-            }
-            return swedish_model
-        except Exception as e:
-            print(
-                f"Failed to load Swedish model on {preferred_device} ({preferred_compute}): {e}. "
-                "Retrying on CPU."
-            )
-            swedish_model_cpu = load_model(
-                WHISPER_MODEL_SWEDISH,
-                device="cpu",
-                compute_type=WHISPER_COMPUTE_CPU,
-            )
-            language_model_runtime["sv"] = {
-                "backend": "cpu",
-                "size": WHISPER_MODEL_SWEDISH,
-                "compute_type": WHISPER_COMPUTE_CPU,
-            }
-            return swedish_model_cpu
+def _load_slot(slot: str) -> WhisperModel:
+    started = time.time()
+    try:
+        model_instance = MODEL_LOADERS[slot]()
+    except Exception as e:
+        print(f"Failed to load the '{slot}' model: {e}")
+        _update_model_state(slot, state="failed", error=str(e))
+        raise
+    _update_model_state(
+        slot, state="ready", error=None, load_seconds=round(time.time() - started, 2)
+    )
+    return model_instance
+
 
-    return primary_model
+def request_model(slot: str) -> Future:
+    """Start loading a language slot unless it is loaded or loading, and return its future."""
+    with model_state_lock:
+        future = model_futures.get(slot)
+        if future is None or (future.done() and future.exception() is not None):
+            _update_model_state(slot, state="loading", error=None)
+            future = model_loader.submit(_load_slot, slot)
+            model_futures[slot] = future
+            if slot == "default":
+                # Also a retry after a failed load, which can still make the server ready.
+                readiness.set_loading()
+                _publish_server_state("loading")
+                future.add_done_callback(_signal_readiness)
+        return future
+
+
+def get_model_for_language(language: str | None) -> WhisperModel:
+    """Return a Whisper model suited for the requested language, waiting for it to load."""
+    return request_model(_language_slot(language)).result()
+
+
+async def get_model_for_language_async(language: str | None) -> WhisperModel:
+    """Await a Whisper model suited for the requested language without blocking the event loop."""
+    future = request_model(_language_slot(language))
+    if future.done() and future.exception() is None:
+        # Loads count as model_cache misses; a request served by a loaded model is a hit.
+        model_cache.record_hit()
+    try:
+        return await asyncio.wrap_future(future)
+    except Exception as e:
+        raise HTTPException(status_code=503, detail=f"Whisper model failed to load: {e}")
+
+
+@app.on_event("startup")
+async def start_model_loading():
+    # One Silero VAD model serves every Whisper model; load it before the first request.
+    model_loader.submit(get_vad_model)
+    request_model("default")
+    for language in WHISPER_PRELOAD_LANGUAGES:
+        request_model(_language_slot(language))
+    if WHISPER_IDLE_UNLOAD_SECONDS > 0:
+        asyncio.ensure_future(_unload_idle_models())
+
+
+async def _unload_idle_models():
+    while True:
+        await asyncio.sleep(min(60, WHISPER_IDLE_UNLOAD_SECONDS / 2))
+        await asyncio.to_thread(model_cache.evict_idle)
+
+
+def _signal_readiness(future: Future):
+    # Not under model_state_lock: request_model holds it when a load fails at once.
+    if model_futures.get("default") is not future:
+        return  # Superseded by a retry that signals its own outcome.
+    if future.exception() is not None:
+        readiness.set_failed(f"default Whisper model failed to load: {future.exception()}")
+        _publish_server_state("failed")
+    else:
+        readiness.set_model_ready()
+        _publish_server_state("running")
+
+
+def _key_config() -> dict:
+    return {
+        "dictation": os.getenv('VOICEKEY', 'ctrl_r'),
+        "command": os.getenv('VOICEKEY_CMD', 'scroll_lock'),
+        "custom": os.getenv('VOICEKEY_CUSTOM', 'num_lock')
+    }
+
+
+def _publish_server_state(status: str):
+    events.publish("server", {"status": status, "keys": _key_config()})
 
 class TranscribeRequest(BaseModel):
-    file_path: str
-    language: str = None  # Optional: force specific language ("en", "sv", etc.)
+    file_path: str = None  # Audio file on the server's filesystem (unused by /transcribe/pcm)
+    language: str = None  # Optional: force specific language ("en", "sv", etc.) or "auto"
     task: str = "transcribe"  # "transcribe" or "translate"
     initial_prompt: str = None  # Context prompt for better transcription
+    initial_prompts: Optional[Dict[str, str]] = None  # Per-language prompts for language="auto"
+    session_id: Optional[str] = None  # Reuse the language detected for earlier "auto" requests of this session
     beam_size: int = 5  # Beam search size for better accuracy
     best_of: int = 1  # Number of candidates to consider
     temperature: float = 0  # Sampling temperature (0 = greedy, higher = more random)
     vad_filter: bool = True  # Voice activity detection filter
+    vad_parameters: Optional[Dict[str, float]] = None  # VadOptions overrides, e.g. min_silence_duration_ms, speech_pad_ms
     log_prob_threshold: float = -1.0  # Filter out low-confidence segments
 
 @app.get("/health")
-def health_check():
-    return {"status": "ok"}
+async def health_check():
+    return {"status": "ok", "ready": readiness.is_ready}
 
 @app.get("/status")
-def status_check():
+async def status_check():
     """Return detailed service status information"""
     uptime_seconds = time.time() - service_start_time
     uptime_delta = timedelta(seconds=int(uptime_seconds))
@@ -148,7 +521,7 @@ def status_check():
         uptime_str = f"{uptime_delta.seconds}s"
     
     return {
-        "status": "running",
+        "status": "running" if readiness.is_ready else "loading",
         "uptime": uptime_str,
         "uptime_seconds": int(uptime_seconds),
         "start_time": datetime.fromtimestamp(service_start_time).isoformat(),
@@ -158,25 +531,166 @@ def status_check():
             "compute_type": whisper_compute_type,
         },
         "language_models": language_model_runtime,
-        "model": os.getenv('OLLAMA_MODEL', 'gemma3:27b'),
-        "keys": {
-            "dictation": os.getenv('VOICEKEY', 'ctrl_r'),
-            "command": os.getenv('VOICEKEY_CMD', 'scroll_lock'),
-            "custom": os.getenv('VOICEKEY_CUSTOM', 'num_lock')
+        "inference": inference_pool.stats(),
+        "cpu_tuning": {
+            "calibrate": WHISPER_CPU_CALIBRATE,
+            "available_cores": available_cores(),
+            "reserved_cores": WHISPER_CPU_RESERVED_CORES,
+            "models": cpu_tuning_applied,
+        },
+        "model_cache": model_cache.stats(),
+        "transcript_cache": result_cache.stats(),
+        "auto_language": {
+            "languages": WHISPER_AUTO_LANGUAGES,
+            "confidence": WHISPER_AUTO_CONFIDENCE,
+            **language_sessions.stats(),
+        },
+        "temperature_fallback": {
+            "segments": fallback_segments.snapshot(),
+            "requests": fallback_requests.snapshot(),
         },
+        "batching": batch_scheduler.stats() if batch_scheduler is not None else {"enabled": False},
+        "request_latency_seconds": request_latency.snapshot(),
+        "model": os.getenv('OLLAMA_MODEL', 'gemma3:27b'),
+        "keys": _key_config(),
         "screenshot_enabled": os.getenv('INCLUDE_SCREENSHOT', 'true').lower() == 'true',
-        "screenshot_max_width": int(os.getenv('SCREENSHOT_MAX_WIDTH', '1024'))
+        "screenshot_max_width": int(os.getenv('SCREENSHOT_MAX_WIDTH', '1024')),
+        "screenshot_format": os.getenv('SCREENSHOT_FORMAT', 'jpeg').lower(),
     }
 
-@app.post("/transcribe/")
-async def transcribe(request: TranscribeRequest):
+@app.get("/events")
+async def event_stream():
+    """Server-Sent Events: the current state, then every change as it happens."""
+    return StreamingResponse(
+        events.subscribe(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"}
+    )
+
+@app.post("/events/request")
+async def publish_request_event(event: dict):
+    """Relay a client's lifecycle stage of a request (recording, recorded, done) to /events."""
+    if not isinstance(event.get("request_id"), str) or not isinstance(event.get("stage"), str):
+        raise HTTPException(status_code=422, detail="request_id and stage are required")
+    events.publish("request", {**event, "source": "client"})
+    return {"subscribers": events.subscriber_count()}
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def prometheus_metrics():
+    """Serve request, stage and model metrics in the Prometheus text format."""
+    metrics = PrometheusText()
+    metrics.gauge("vibevoice_ready", "1 once the default model is loaded", int(readiness.is_ready))
+    metrics.gauge("vibevoice_uptime_seconds", "Seconds since the server started",
+                  round(time.time() - service_start_time, 1))
+    metrics.histogram("vibevoice_request_duration_seconds", "End-to-end transcription request latency",
+                      request_latency.snapshot())
+    for name, snapshot in sorted(stage_seconds.snapshot().items()):
+        metrics.histogram("vibevoice_stage_duration_seconds", "Seconds spent per request in each stage",
+                          snapshot, stage=name)
+    for temperature, snapshot in sorted(decode_seconds.snapshot().items()):
+        metrics.histogram("vibevoice_decode_duration_seconds", "Decoder seconds per request by temperature",
+                          snapshot, temperature=temperature)
+    metrics.histogram("vibevoice_audio_duration_seconds", "Seconds of audio per transcribed request",
+                      audio_duration.snapshot())
+    metrics.histogram("vibevoice_real_time_factor", "Inference seconds per second of audio",
+                      real_time_factor.snapshot())
+    for temperature, count in sorted(fallback_segments.snapshot().items()):
+        metrics.counter("vibevoice_fallback_segments", "Segments by the temperature they were decoded at",
+                        count, temperature=temperature)
+    for temperature, count in sorted(fallback_requests.snapshot().items()):
+        metrics.counter("vibevoice_fallback_requests", "Requests by the highest temperature they needed",
+                        count, temperature=temperature)
+    metrics.gauge("vibevoice_inference_queue_depth", "Requests waiting for an inference worker",
+                  inference_pool.queue_depth())
+
+    transcript_cache = result_cache.stats()
+    metrics.counter("vibevoice_transcript_cache_hits", "Transcript cache hits", transcript_cache["hits"])
+    metrics.counter("vibevoice_transcript_cache_misses", "Transcript cache misses", transcript_cache["misses"])
+    metrics.counter("vibevoice_transcript_cache_joins", "Requests that joined an identical decode in flight",
+                    transcript_cache["joins"])
+
+    models = model_cache.stats()
+    metrics.gauge("vibevoice_model_cache_used_bytes", "Estimated RAM used by loaded models",
+                  models["used_mb"] * 2**20)
+    metrics.counter("vibevoice_model_cache_evictions", "Models unloaded by the model cache", models["evictions"])
+    for model_stats in models["models"]:
+        metrics.gauge("vibevoice_model_loaded", "Models currently loaded", 1, model=model_stats["model"],
+                      device=model_stats["device"], compute_type=model_stats["compute_type"])
+
+    if batch_scheduler is not None:
+        metrics.histogram("vibevoice_batch_size", "Requests per decoded batch",
+                          batch_scheduler.batch_sizes.snapshot())
+    return metrics.render()
+
+def decode_pcm(data: bytes, sample_format: str) -> np.ndarray:
+    """Convert raw little-endian mono PCM bytes to float32 samples in [-1, 1]."""
+    dtype, scale = PCM_FORMATS[sample_format]
+    samples = np.frombuffer(data, dtype=dtype)
+    if scale == 1.0:
+        return samples
+    return samples.astype(np.float32) / scale
+
+def _is_confident(segment, log_prob_threshold) -> bool:
+    avg_logprob = getattr(segment, 'avg_logprob', None)
+    return log_prob_threshold is None or avg_logprob is None or avg_logprob > log_prob_threshold
+
+def _filter_segments(segments, log_prob_threshold):
+    """Drop low-confidence segments, keeping all of them if none would remain."""
+    if log_prob_threshold is None:
+        return segments
+
+    filtered_segments = [segment for segment in segments if _is_confident(segment, log_prob_threshold)]
+
+    # Fall back to the unfiltered segments if we filtered everything out.
+    if filtered_segments:
+        return filtered_segments
+    if segments:
+        print(
+            "All segments were filtered out by log_prob_threshold; "
+            "returning unfiltered transcription instead."
+        )
+    return segments
+
+def _temperatures(request: TranscribeRequest):
+    """Temperatures to decode with, in fallback order."""
+    return [request.temperature, 0.2, 0.4] if request.temperature == 0 else [request.temperature]
+
+def _record_fallbacks(segments, temperatures):
+    """Count which temperature each segment was finally decoded at."""
+    worst_level = 0
+    for segment in segments:
+        temperature = getattr(segment, 'temperature', None)
+        if temperature is None:
+            continue
+        level = temperatures.index(temperature) if temperature in temperatures else len(temperatures) - 1
+        fallback_segments.inc(temperature_label(temperature))
+        worst_level = max(worst_level, level)
+    if segments:
+        fallback_requests.inc(temperature_label(temperatures[worst_level]))
+
+def _segments(request: TranscribeRequest, audio, model_instance: WhisperModel,
+              speech: Optional[List[dict]] = None):
+    """Start transcribing a file path or a 16 kHz float32 array; returns (segments, info).
+
+    All fallback temperatures go to faster-whisper in a single call. It
+    computes the features and encoder output of each 30 s window once and
+    only re-decodes a window at the next temperature when its result fails
+    the compression ratio or log_prob_threshold check, instead of running a
+    whole new transcription per temperature.
+
+    `speech` holds the regions found by _detect_speech. Only those are
+    decoded, and segment timestamps are mapped back to the full recording.
+    Segments are decoded as the returned generator is consumed.
+    """
+    if speech is not None:
+        audio = np.concatenate(collect_chunks(audio, speech)[0])
+
     # Prepare transcription parameters with advanced decoding settings
     transcribe_kwargs = {
-        "audio": request.file_path,
+        "audio": audio,
         "beam_size": request.beam_size,
         "best_of": request.best_of,
-        "temperature": request.temperature,
-        "vad_filter": request.vad_filter,
+        "temperature": _temperatures(request),
+        "compression_ratio_threshold": COMPRESSION_RATIO_THRESHOLD,
+        "vad_filter": False,
         "log_prob_threshold": request.log_prob_threshold,
     }
 
@@ -188,53 +702,812 @@ async def transcribe(request: TranscribeRequest):
     if request.initial_prompt:
         transcribe_kwargs["initial_prompt"] = request.initial_prompt
 
-    # Try transcription with temperature fallback for robustness
-    temperatures_to_try = [request.temperature, 0.2, 0.4] if request.temperature == 0 else [request.temperature]
+    segments, info = model_instance.transcribe(**transcribe_kwargs)
+    if speech is not None:
+        segments = restore_speech_timestamps(segments, speech, SAMPLE_RATE)
+    return segments, info
 
-    model_instance = get_model_for_language(request.language)
+def _run_transcription(request: TranscribeRequest, audio, model_instance: WhisperModel,
+                       speech: Optional[List[dict]] = None, race: Optional[LanguageRace] = None,
+                       on_segment=None):
+    """Transcribe with the request's options and return the response body.
 
-    for temp in temperatures_to_try:
+    With a `race`, each segment is reported to it and None is returned as
+    soon as another language's decode is ahead. on_segment(segment) is
+    called from the worker thread with each segment the log-prob filter
+    keeps, as soon as it is decoded. A failed decode returns empty text
+    with an "error", which is never cached.
+    """
+    try:
+        segments, info = _segments(request, audio, model_instance, speech)
+        if race is not None:
+            segments = _race_segments(segments, race, request.language)
+            if segments is None:
+                return None
+        elif on_segment is not None:
+            segments = _emit_segments(segments, on_segment, request.log_prob_threshold)
+        segments = list(segments)
+    except Exception as e:
+        print(f"Transcription failed: {e}")
+        fallback_requests.inc("error")
+        return {"text": "", "error": f"Transcription failed: {e}"}
+
+    timings = current_timings()
+    if timings is not None:
+        timings.audio_seconds = len(audio) / SAMPLE_RATE if speech is not None else info.duration
+
+    _record_fallbacks(segments, _temperatures(request))
+    with stage("segment_filter"):
+        segments = _filter_segments(segments, request.log_prob_threshold)
+    text = " ".join([segment.text.strip() for segment in segments])
+    return _with_speech({"text": text}, speech)
+
+def _emit_segments(segments, on_segment, log_prob_threshold):
+    """Yield the segments, passing each one the log-prob filter keeps to on_segment."""
+    for segment in segments:
+        if _is_confident(segment, log_prob_threshold):
+            on_segment(segment)
+        yield segment
+
+def _race_segments(segments, race: LanguageRace, language: str):
+    """Decode segments while the language is still in the race; None once it lost.
+
+    Leaving faster-whisper's generator early skips the remaining windows.
+    """
+    decoded = []
+    for segment in segments:
+        decoded.append(segment)
+        if not race.report(language, segment):
+            return None
+    race.finish(language)
+    return decoded
+
+def _vad_options(request: TranscribeRequest) -> VadOptions:
+    """faster-whisper's VAD defaults with the request's vad_parameters applied.
+
+    Regions are capped at one Whisper window, so the batched pipeline can
+    use them as clips directly.
+    """
+    parameters = dict(request.vad_parameters or {})
+    parameters["max_speech_duration_s"] = min(
+        parameters.get("max_speech_duration_s", WHISPER_WINDOW_SECONDS), WHISPER_WINDOW_SECONDS
+    )
+    try:
+        return VadOptions(**parameters)
+    except TypeError as e:
+        raise HTTPException(status_code=422, detail=f"Invalid vad_parameters: {e}")
+
+def _prefixed_query_parameters(query_params, prefix: str) -> Dict[str, str]:
+    """<prefix><name>=value query parameters as a dict keyed by name."""
+    return {key[len(prefix):]: value for key, value in query_params.items() if key.startswith(prefix)}
+
+def _vad_query_parameters(query_params) -> Dict[str, str]:
+    """vad_<name>=value query parameters as a vad_parameters dict (vad_filter excluded)."""
+    parameters = _prefixed_query_parameters(query_params, "vad_")
+    parameters.pop("filter", None)
+    return parameters
+
+def _detect_speech(audio, vad_options: VadOptions, timings: RequestTimings):
+    """Return (samples, speech regions in samples), decoding a file path first."""
+    if isinstance(audio, str):
+        with timings.stage("audio_decode"):
+            audio = decode_audio(audio, sampling_rate=SAMPLE_RATE)
+    with timings.stage("vad"):
+        regions = get_speech_timestamps(audio, vad_options)
+    return audio, regions
+
+def _with_speech(result: dict, speech: Optional[List[dict]]) -> dict:
+    """Add the speech regions, in seconds, to a result when VAD ran."""
+    if speech is None:
+        return result
+    return {**result, "speech": [
+        [round(region["start"] / SAMPLE_RATE, 2), round(region["end"] / SAMPLE_RATE, 2)] for region in speech
+    ]}
+
+def _speech_clips(audio: np.ndarray, speech: Optional[List[dict]]):
+    """Split audio into clips of at most one Whisper window, in samples.
+
+    Clips cover the speech regions when VAD ran, and the whole audio otherwise.
+    """
+    window = WHISPER_WINDOW_SECONDS * SAMPLE_RATE
+    if speech is not None:
+        regions = speech
+    else:
+        regions = [{"start": start, "end": min(start + window, len(audio))}
+                   for start in range(0, len(audio), window)]
+
+    # Merge neighbouring speech regions while they still fit in one window.
+    clips = []
+    for region in regions:
+        if clips and region["end"] - clips[-1]["start"] <= window:
+            clips[-1]["end"] = region["end"]
+        else:
+            clips.append({"start": region["start"], "end": region["end"]})
+    return clips
+
+def _needs_fallback(segment, log_prob_threshold) -> bool:
+    """Whether a segment fails the checks that make faster-whisper try the next temperature."""
+    compression_ratio = getattr(segment, 'compression_ratio', None)
+    return ((compression_ratio is not None and compression_ratio > COMPRESSION_RATIO_THRESHOLD)
+            or not _is_confident(segment, log_prob_threshold))
+
+def _mean_logprob(segments) -> float:
+    return sum(segment.avg_logprob for segment in segments) / len(segments)
+
+def _fallback_batched(request: TranscribeRequest, audio: np.ndarray, segments, model_instance: WhisperModel):
+    """Re-decode the batched segments that need a fallback at the remaining temperatures.
+
+    The batched pipeline only decodes at the first temperature. A segment
+    that fails the compression ratio or log_prob_threshold check is decoded
+    again on its own through the sequential path, and the result replaces it
+    when its avg_logprob is better, as faster-whisper does per window.
+    """
+    temperatures = _temperatures(request)
+    if len(temperatures) < 2:
+        return segments
+    result = []
+    for segment in segments:
+        if not _needs_fallback(segment, request.log_prob_threshold):
+            result.append(segment)
+            continue
+        clip = audio[int(segment.start * SAMPLE_RATE):int(segment.end * SAMPLE_RATE)]
+        with stage("batch_fallback"):
+            redecoded, _ = model_instance.transcribe(
+                clip,
+                language=request.language,
+                task=request.task,
+                initial_prompt=request.initial_prompt,
+                beam_size=request.beam_size,
+                best_of=request.best_of,
+                temperature=temperatures[1:],
+                compression_ratio_threshold=COMPRESSION_RATIO_THRESHOLD,
+                log_prob_threshold=request.log_prob_threshold,
+                vad_filter=False,
+            )
+            redecoded = list(redecoded)
+        if not redecoded or (segment.avg_logprob is not None
+                             and _mean_logprob(redecoded) <= segment.avg_logprob):
+            result.append(segment)
+            continue
+        result.extend(
+            ChunkSegment(segment.start + piece.start, min(segment.start + piece.end, segment.end),
+                         piece.text, piece.avg_logprob, piece.temperature)
+            for piece in redecoded
+        )
+    return result
+
+def _run_batched_transcription(request: TranscribeRequest, audios, speeches, model_instance: WhisperModel):
+    """Transcribe several recordings with compatible options in one batched pass.
+
+    Each recording is cut into clips of at most one Whisper window. All clips
+    are concatenated and decoded together by faster-whisper's batched pipeline,
+    and the resulting segments are handed back to the recording they came from.
+    Segments that need a fallback temperature are re-decoded afterwards (see
+    _fallback_batched). Returns one (result, audio_seconds) pair per recording.
+    """
+    pieces, clips, owners = [], [], []
+    offset = 0
+    for index, (audio, speech) in enumerate(zip(audios, speeches)):
+        if isinstance(audio, str):
+            with stage("audio_decode"):
+                audio = decode_audio(audio, sampling_rate=SAMPLE_RATE)
+        for clip in _speech_clips(audio, speech):
+            clips.append({"start": offset + clip["start"], "end": offset + clip["end"]})
+            owners.append(index)
+        pieces.append(audio)
+        offset += len(audio)
+
+    per_request = [[] for _ in audios]
+    if clips:
+        audio = np.concatenate(pieces)
+        temperatures = _temperatures(request)
+        pipeline = BatchedInferencePipeline(model=model_instance)
+        # Only temperatures[0] is used here; _fallback_batched covers the rest.
+        segments, _ = pipeline.transcribe(
+            audio,
+            language=request.language,
+            task=request.task,
+            initial_prompt=request.initial_prompt,
+            beam_size=request.beam_size,
+            best_of=request.best_of,
+            temperature=temperatures,
+            compression_ratio_threshold=COMPRESSION_RATIO_THRESHOLD,
+            log_prob_threshold=request.log_prob_threshold,
+            vad_filter=False,
+            clip_timestamps=clips,
+            batch_size=min(len(clips), WHISPER_BATCH_MAX_SIZE),
+        )
+        segments = _fallback_batched(request, audio, list(segments), model_instance)
+        _record_fallbacks(segments, temperatures)
+        clip_starts = [clip["start"] / SAMPLE_RATE for clip in clips]
+        for segment in segments:
+            midpoint = (segment.start + segment.end) / 2
+            clip_index = max(bisect.bisect_right(clip_starts, midpoint) - 1, 0)
+            per_request[owners[clip_index]].append(segment)
+
+    results = []
+    for segments, audio, speech in zip(per_request, pieces, speeches):
+        with stage("segment_filter"):
+            segments = _filter_segments(segments, request.log_prob_threshold)
+        results.append((_with_speech({"text": " ".join(segment.text.strip() for segment in segments)}, speech),
+                        len(audio) / SAMPLE_RATE))
+    return results
+
+def _run_chunk(request: TranscribeRequest, audio: np.ndarray, model_instance: WhisperModel,
+               speech: Optional[List[dict]]):
+    """Decode one long-form chunk; segment timestamps are relative to the chunk, None if it failed."""
+    try:
+        return list(_segments(request, audio, model_instance, speech)[0])
+    except Exception as e:
+        print(f"Transcription of a long-form chunk failed: {e}")
+        return None
+
+async def _decode_long_form(request: TranscribeRequest, audio: np.ndarray, model_instance: WhisperModel,
+                            timings: RequestTimings, speech: Optional[List[dict]]):
+    """Decode a long recording as chunks in parallel and join their segments.
+
+    At most as many chunks as the model has workers are submitted at once,
+    so a long recording neither overflows the queue nor starves the other
+    requests' turns for long. If a chunk fails, the text of the others comes
+    with an "error", so the incomplete transcript is not cached.
+    """
+    regions = speech
+    if regions is None:
+        # Without vad_filter, VAD only places the cuts and whole chunks are decoded.
+        with timings.stage("vad"):
+            regions = await asyncio.to_thread(get_speech_timestamps, audio, VadOptions())
+    chunks = plan_chunks(len(audio), regions, int(WHISPER_LONG_FORM_CHUNK_SECONDS * SAMPLE_RATE),
+                         int(WHISPER_LONG_FORM_OVERLAP_SECONDS * SAMPLE_RATE))
+    workers = asyncio.Semaphore(inference_pool.concurrency_of(request_model_key(model_instance)))
+
+    async def decode_chunk(start, end):
+        clip_speech = chunk_speech(speech, start, end) if speech is not None else None
+        if clip_speech == []:
+            return []
+        async with workers:
+            return await run_inference(model_instance, _run_chunk, request, audio[start:end], model_instance,
+                                       clip_speech, timings=timings)
+
+    with timings.stage("long_form"):
+        results = await asyncio.gather(*(decode_chunk(start, end) for start, end in chunks))
+    failed = sum(chunk_segments is None for chunk_segments in results)
+    segments = stitch([
+        (start / SAMPLE_RATE, end / SAMPLE_RATE, chunk_segments or [])
+        for (start, end), chunk_segments in zip(chunks, results)
+    ])
+    timings.audio_seconds = len(audio) / SAMPLE_RATE
+    print(f"[{timings.request_id}] Long-form: {len(chunks)} chunks of {timings.audio_seconds:.0f}s audio "
+          f"in {timings.stages['long_form']:.2f}s")
+
+    if failed:
+        fallback_requests.inc("error")
+    else:
+        _record_fallbacks(segments, _temperatures(request))
+    with timings.stage("segment_filter"):
+        segments = _filter_segments(segments, request.log_prob_threshold)
+    result = {"text": " ".join(segment.text for segment in segments)}
+    if failed:
+        result["error"] = f"Transcription of {failed} of {len(chunks)} chunks failed"
+    return _with_speech(result, speech)
+
+async def _run_batch(items):
+    """Decode a batch, charging each request with its share of the batch's stages.
+
+    A request's share is its part of the batch's audio, so per-request RTF
+    and the stage histograms add up to the batch's real cost. "queued" and
+    "decoding" are published under each request's own id.
+    """
+    request, model_instance, _, _, _ = items[0]
+    audios = [audio for _, _, audio, _, _ in items]
+    speeches = [speech for _, _, _, _, speech in items]
+    batch_timings = RequestTimings("batch")
+    outputs = await run_inference(model_instance, _run_batched_transcription, request, audios, speeches,
+                                  model_instance, timings=batch_timings,
+                                  publish_for=[timings.request_id for _, _, _, timings, _ in items])
+    total_seconds = sum(audio_seconds for _, audio_seconds in outputs)
+    results = []
+    for (_, _, _, timings, _), (result, audio_seconds) in zip(items, outputs):
+        timings.merge(batch_timings, audio_seconds / total_seconds if total_seconds else 1 / len(items))
+        timings.audio_seconds = audio_seconds
+        results.append(result)
+    return results
+
+batch_scheduler = (
+    BatchScheduler(_run_batch, WHISPER_BATCH_WINDOW_MS / 1000, WHISPER_BATCH_MAX_SIZE)
+    if WHISPER_BATCH_WINDOW_MS > 0 else None
+)
+
+def _decode_key(request: TranscribeRequest, model_instance: WhisperModel):
+    """The model and every decode option that can change the transcript.
+
+    Requests with equal keys can share a batch, and a cached result is only
+    reused for the same audio with an equal key.
+    """
+    return (
+        request_model_key(model_instance),
+        request.language,
+        request.task,
+        request.initial_prompt,
+        request.beam_size,
+        request.best_of,
+        request.temperature,
+        request.vad_filter,
+        tuple(sorted((request.vad_parameters or {}).items())),
+        request.log_prob_threshold,
+    )
+
+async def _decode(request: TranscribeRequest, audio, model_instance: WhisperModel, timings: RequestTimings,
+                  speech: Optional[List[dict]] = None, on_segment=None):
+    """Decode on the model's workers; on_segment receives segments as they are decoded.
+
+    Batched and long-form decodes only finish as a whole and never call it.
+    With batching enabled, throughput wins over segments as they are decoded.
+    """
+    if request.vad_filter and speech is None:
+        # VAD runs before the request queues for the model, and a clip without
+        # speech (an accidental key tap) never reaches the encoder.
+        audio, speech = await asyncio.to_thread(_detect_speech, audio, _vad_options(request), timings)
+        if not speech:
+            timings.audio_seconds = len(audio) / SAMPLE_RATE
+            return _with_speech({"text": ""}, speech)
+
+    workers = inference_pool.concurrency_of(request_model_key(model_instance))
+    if WHISPER_LONG_FORM_SECONDS > 0 and workers > 1:
+        if isinstance(audio, str):
+            with timings.stage("audio_decode"):
+                audio = await asyncio.to_thread(decode_audio, audio, sampling_rate=SAMPLE_RATE)
+        if len(audio) > WHISPER_LONG_FORM_SECONDS * SAMPLE_RATE:
+            return await _decode_long_form(request, audio, model_instance, timings, speech)
+
+    # Without a fixed language the batched pipeline would detect one language for all clips.
+    if batch_scheduler is not None and request.language:
+        return await batch_scheduler.submit(
+            _decode_key(request, model_instance), (request, model_instance, audio, timings, speech)
+        )
+    return await run_inference(model_instance, _run_transcription, request, audio, model_instance, speech,
+                               None, on_segment, timings=timings)
+
+def _request_timings(request: Request) -> RequestTimings:
+    """Timings for a request, under the client's X-Request-ID if it sent one."""
+    return RequestTimings(request.headers.get("x-request-id") or uuid.uuid4().hex[:12])
+
+def _observe_timings(timings: RequestTimings, total_seconds: float):
+    """Feed one request's timings into the /metrics histograms and log them."""
+    for name, seconds in timings.stages.items():
+        stage_seconds.observe(name, seconds)
+    for temperature, seconds in timings.decode.items():
+        decode_seconds.observe(temperature, seconds)
+    if timings.audio_seconds:
+        audio_duration.observe(timings.audio_seconds)
+    rtf = timings.real_time_factor
+    if rtf is not None:
+        real_time_factor.observe(rtf)
+
+    _publish_request_stage(
+        timings.request_id, "transcribed", server_ms=round(total_seconds * 1000),
+        audio_seconds=timings.audio_seconds, rtf=round(rtf, 3) if rtf is not None else None,
+        cached=timings.cached,
+    )
+
+    breakdown = " ".join(f"{name}={seconds:.3f}" for name, seconds in timings.stages.items())
+    decode = " ".join(f"decode@{label}={seconds:.3f}" for label, seconds in timings.decode.items())
+    audio = f"{timings.audio_seconds:.2f}s audio" if timings.audio_seconds else "audio"
+    print(f"[{timings.request_id}] {audio} in {total_seconds:.3f}s"
+          f"{f' (rtf {rtf:.2f})' if rtf is not None else ''}"
+          f"{' from cache' if timings.cached else ''}: {breakdown} {decode}".rstrip())
+
+async def _transcribe(request: TranscribeRequest, audio, timings: RequestTimings, on_segment=None):
+    started = time.perf_counter()
+    try:
+        if request.language == AUTO_LANGUAGE:
+            return await _transcribe_auto(request, audio, timings, on_segment)
+        return await _transcribe_cached(request, audio, timings, on_segment=on_segment)
+    finally:
+        total_seconds = time.perf_counter() - started
+        request_latency.observe(total_seconds)
+        _observe_timings(timings, total_seconds)
+
+async def _transcribe_cached(request: TranscribeRequest, audio, timings: RequestTimings,
+                             speech: Optional[List[dict]] = None, on_segment=None):
+    """Decode with the request's language model, through the transcript cache."""
+    # Waits (without blocking the event loop) if the language model is still loading.
+    model_instance = await get_model_for_language_async(request.language)
+    if not result_cache.enabled:
+        return await _decode(request, audio, model_instance, timings, speech, on_segment)
+
+    cache_key = (await asyncio.to_thread(audio_fingerprint, audio), _decode_key(request, model_instance))
+    # A retry of a request that is still decoding waits for the first one, and
+    # decodes again itself if that one failed, whether with an error result or
+    # an exception such as a 429 or 503.
+    while (inflight := inflight_transcriptions.get(cache_key)) is not None:
         try:
-            transcribe_kwargs["temperature"] = temp
-            segments, info = model_instance.transcribe(**transcribe_kwargs)
-
-            # Filter segments by log probability if threshold is set
-            if request.log_prob_threshold is not None:
-                filtered_segments = []
-                for segment in segments:
-                    avg_logprob = getattr(segment, 'avg_logprob', None)
-                    if avg_logprob is None or avg_logprob > request.log_prob_threshold:
-                        filtered_segments.append(segment)
-
-                # Fall back to the unfiltered segments if we filtered everything out.
-                if filtered_segments:
-                    segments = filtered_segments
-                else:
-                    print(
-                        "All segments were filtered out by log_prob_threshold; "
-                        "returning unfiltered transcription instead."
-                    )
-
-            text = " ".join([segment.text.strip() for segment in segments])
-
-            # If we got text with the first temperature, return it
-            if text.strip() and temp == request.temperature:
-                return {"text": text}
-
-            # If we got text with fallback temperature, log it and return
-            if text.strip():
-                print(f"Used fallback temperature {temp} for transcription")
-                return {"text": text}
+            result = await asyncio.shield(inflight)
+        except Exception:
+            continue
+        if "error" not in result:
+            result_cache.record_join()
+            timings.cached = True
+            return dict(result)
+
+    cached = result_cache.get(cache_key)
+    if cached is not None:
+        timings.cached = True
+        return cached
+
+    inflight = asyncio.get_running_loop().create_future()
+    inflight_transcriptions[cache_key] = inflight
+    try:
+        result = await _decode(request, audio, model_instance, timings, speech, on_segment)
+    except Exception as e:
+        inflight.set_exception(e)
+        # Retrieve it so an exception nobody else awaited is not logged as unhandled.
+        inflight.exception()
+        raise
+    else:
+        if "error" not in result:
+            result_cache.put(cache_key, result)
+        inflight.set_result(result)
+        return result
+    finally:
+        del inflight_transcriptions[cache_key]
 
+def _for_language(request: TranscribeRequest, language: str) -> TranscribeRequest:
+    """An "auto" request as a request for `language`, with that language's prompt."""
+    prompt = (request.initial_prompts or {}).get(language, request.initial_prompt)
+    return request.model_copy(update={"language": language, "initial_prompt": prompt})
+
+def _language_probabilities(model_instance: WhisperModel, audio: np.ndarray, speech: Optional[List[dict]]):
+    """Probabilities of the WHISPER_AUTO_LANGUAGES from one encoder pass over the first 30 s of speech."""
+    if speech is not None:
+        audio = np.concatenate(collect_chunks(audio, speech)[0])
+    with stage("language_detect"):
+        _, _, all_language_probs = model_instance.detect_language(audio[:WHISPER_WINDOW_SECONDS * SAMPLE_RATE])
+    return candidate_probabilities(all_language_probs, WHISPER_AUTO_LANGUAGES)
+
+async def _decode_speculatively(request: TranscribeRequest, audio, speech, probabilities: Dict[str, float],
+                                timings: RequestTimings):
+    """Decode in every candidate language at once and return (result, language) of the best.
+
+    Each language runs on its own model's workers; the one whose segments
+    score lower stops at its next segment (see LanguageRace).
+    """
+    race = LanguageRace(probabilities)
+    languages = list(probabilities)
+    models = await asyncio.gather(*(get_model_for_language_async(language) for language in languages))
+    results = await asyncio.gather(*(
+        run_inference(model_instance, _run_transcription, _for_language(request, language), audio,
+                      model_instance, speech, race, timings=timings)
+        for language, model_instance in zip(languages, models)
+    ))
+    language = race.winner([language for language, result in zip(languages, results) if result is not None])
+    return results[languages.index(language)], language
+
+async def _transcribe_auto(request: TranscribeRequest, audio, timings: RequestTimings, on_segment=None):
+    """Transcribe in the session's language, detecting it first if the session has none.
+
+    VAD runs once here; detection, routing and the speculative decodes all
+    reuse its speech regions.
+    """
+    speech = None
+    if request.vad_filter:
+        audio, speech = await asyncio.to_thread(_detect_speech, audio, _vad_options(request), timings)
+        if not speech:
+            timings.audio_seconds = len(audio) / SAMPLE_RATE
+            return _with_speech({"text": ""}, speech)
+    elif isinstance(audio, str):
+        with timings.stage("audio_decode"):
+            audio = await asyncio.to_thread(decode_audio, audio, sampling_rate=SAMPLE_RATE)
+
+    language = language_sessions.get(request.session_id)
+    if language is not None:
+        _publish_request_stage(timings.request_id, "language", language=language, session=True)
+        result = await _transcribe_cached(_for_language(request, language), audio, timings, speech, on_segment)
+        return {**result, "language": language}
+
+    detector = await get_model_for_language_async(WHISPER_AUTO_DETECT_LANGUAGE)
+    probabilities = await run_inference(detector, _language_probabilities, detector, audio, speech, timings=timings)
+    ranked = sorted(probabilities, key=probabilities.get, reverse=True)
+    speculative = probabilities[ranked[0]] < WHISPER_AUTO_CONFIDENCE and len(ranked) > 1
+    _publish_request_stage(timings.request_id, "language", language=ranked[0], speculative=speculative,
+                           probabilities={language: round(p, 3) for language, p in probabilities.items()})
+    if speculative:
+        result, language = await _decode_speculatively(
+            request, audio, speech, {language: probabilities[language] for language in ranked[:2]}, timings
+        )
+    else:
+        language = ranked[0]
+        result = await _transcribe_cached(_for_language(request, language), audio, timings, speech, on_segment)
+    language_sessions.put(request.session_id, language)
+    return {**result, "language": language}
+
+def _wants_segments(http_request: Request) -> bool:
+    return "application/x-ndjson" in http_request.headers.get("accept", "")
+
+def _segment_stream(request: TranscribeRequest, audio, timings: RequestTimings) -> StreamingResponse:
+    """Answer with newline-delimited JSON: each segment as it is decoded, then the result.
+
+    Segment lines are {"type": "segment", "start", "end", "text"} and the
+    last line is the usual response body with "type": "done", or
+    {"type": "error", "status", "detail"}. A cached, batched or long-form
+    result arrives in the done line only.
+    """
+    loop = asyncio.get_running_loop()
+    lines = asyncio.Queue()
+
+    def on_segment(segment):
+        line = {"type": "segment", "start": round(segment.start, 2), "end": round(segment.end, 2),
+                "text": segment.text.strip()}
+        loop.call_soon_threadsafe(lines.put_nowait, line)
+
+    transcription = asyncio.ensure_future(_transcribe(request, audio, timings, on_segment))
+    # Queued after every segment, since those are put on the loop before the decode returns.
+    transcription.add_done_callback(lambda _: lines.put_nowait(None))
+
+    async def body():
+        while (line := await lines.get()) is not None:
+            yield json.dumps(line) + "\n"
+        try:
+            result = transcription.result()
+        except HTTPException as e:
+            yield json.dumps({"type": "error", "status": e.status_code, "detail": e.detail}) + "\n"
+            return
         except Exception as e:
-            print(f"Transcription failed with temperature {temp}: {e}")
-            continue
+            # Segments may already be sent, so end with an error line rather than a cut-off body.
+            print(f"[{timings.request_id}] Segment stream failed: {e!r}")
+            yield json.dumps({"type": "error", "status": 500, "detail": f"Transcription failed: {e}"}) + "\n"
+            return
+        yield json.dumps({"type": "done", **result, "timings": timings.as_dict()}) + "\n"
+
+    return StreamingResponse(body(), media_type="application/x-ndjson")
+
+@app.post("/transcribe/")
+async def transcribe(request: TranscribeRequest, http_request: Request):
+    """Transcribe a file; with "Accept: application/x-ndjson" segments stream as they are decoded."""
+    if not request.file_path:
+        raise HTTPException(status_code=422, detail="file_path is required; use /transcribe/pcm for raw audio")
+    timings = _request_timings(http_request)
+    if _wants_segments(http_request):
+        return _segment_stream(request, request.file_path, timings)
+    result = await _transcribe(request, request.file_path, timings)
+    return {**result, "timings": timings.as_dict()}
+
+@app.post("/transcribe/pcm")
+async def transcribe_pcm(request: Request, sample_format: str = "f32le", sample_rate: int = SAMPLE_RATE):
+    """Transcribe raw mono PCM sent as the request body.
+
+    Decoding options are the TranscribeRequest fields, passed as query
+    parameters; vad_parameters go in as vad_<name>, e.g.
+    vad_min_silence_duration_ms=200, and initial_prompts as
+    initial_prompt_<language>. The samples go straight to
+    faster-whisper as a NumPy array, skipping the WAV write, re-read and
+    resampling of the file path mode. Segments can be streamed as in
+    /transcribe/.
+    """
+    if sample_format not in PCM_FORMATS:
+        raise HTTPException(status_code=400, detail=f"Unsupported sample_format '{sample_format}'")
+    if sample_rate != SAMPLE_RATE:
+        raise HTTPException(status_code=400, detail=f"sample_rate must be {SAMPLE_RATE}")
+
+    vad_parameters = _vad_query_parameters(request.query_params)
+    initial_prompts = _prefixed_query_parameters(request.query_params, "initial_prompt_")
+    options = {
+        key: value for key, value in request.query_params.items()
+        if key not in ("sample_format", "sample_rate", "file_path")
+        and (key == "vad_filter" or not key.startswith(("vad_", "initial_prompt_")))
+    }
+    try:
+        transcribe_request = TranscribeRequest(**options, vad_parameters=vad_parameters or None,
+                                               initial_prompts=initial_prompts or None)
+    except ValidationError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+
+    timings = _request_timings(request)
+    body = await request.body()
+    if len(body) % PCM_FORMATS[sample_format][0].itemsize:
+        raise HTTPException(status_code=400, detail="Body length is not a whole number of samples")
+    if not body:
+        return {"text": "", "timings": timings.as_dict()}
+
+    with timings.stage("audio_decode"):
+        audio = decode_pcm(body, sample_format)
+    timings.audio_seconds = len(audio) / SAMPLE_RATE
+    if _wants_segments(request):
+        return _segment_stream(transcribe_request, audio, timings)
+    result = await _transcribe(transcribe_request, audio, timings)
+    return {**result, "timings": timings.as_dict()}
+
+def _decode_window(model_instance, window, prompt, language, task, beam_size, vad_options):
+    """Transcribe one streaming window and return (start, end, text) tuples."""
+    segments, _ = model_instance.transcribe(
+        window,
+        language=language,
+        task=task,
+        initial_prompt=prompt,
+        beam_size=beam_size,
+        vad_filter=vad_options is not None,
+        vad_parameters=vad_options,
+        condition_on_previous_text=False,
+    )
+    return [(segment.start, segment.end, segment.text) for segment in segments]
+
+
+@app.post("/transcribe/stream")
+async def transcribe_stream(
+    request: Request,
+    language: str = None,
+    task: str = "transcribe",
+    initial_prompt: str = None,
+    beam_size: int = 5,
+    vad_filter: bool = True,
+    session_id: str = None,
+    sample_format: str = "f32le",
+    sample_rate: int = SAMPLE_RATE,
+):
+    """Transcribe mono PCM uploaded with chunked transfer encoding.
+
+    Stabilized prefixes are decoded while the upload is still running, so only
+    the last few seconds of audio remain to be decoded once the body ends.
+
+    With language="auto" the passes use the language detected earlier in the
+    session. A session without one has its whole upload detected and decoded
+    once the body ends, like /transcribe/pcm.
+    """
+    if sample_format not in PCM_FORMATS:
+        raise HTTPException(status_code=400, detail=f"Unsupported sample_format '{sample_format}'")
+    if sample_rate != SAMPLE_RATE:
+        raise HTTPException(status_code=400, detail=f"sample_rate must be {SAMPLE_RATE}")
+
+    dtype = PCM_FORMATS[sample_format][0]
+    try:
+        options = dict(
+            language=language, task=task, initial_prompt=initial_prompt, beam_size=beam_size,
+            vad_filter=vad_filter, vad_parameters=_vad_query_parameters(request.query_params) or None,
+            initial_prompts=_prefixed_query_parameters(request.query_params, "initial_prompt_") or None,
+            session_id=session_id,
+        )
+        stream_request = TranscribeRequest(**{key: value for key, value in options.items() if value is not None})
+    except ValidationError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    vad_options = _vad_options(stream_request) if vad_filter else None
+    timings = _request_timings(request)
+    model_instance = None
+    result = {}
+    if language == AUTO_LANGUAGE:
+        language = language_sessions.get(session_id)
+        if language is not None:
+            initial_prompt = _for_language(stream_request, language).initial_prompt
+            model_instance = await get_model_for_language_async(language)
+            result = {"language": language}
+    else:
+        model_instance = await get_model_for_language_async(language)
+    transcriber = StreamingTranscriber(holdback_seconds=STREAM_HOLDBACK_SECONDS)
+    step_samples = int(STREAM_STEP_SECONDS * SAMPLE_RATE)
+
+    def start_pass():
+        offset, window, prompt = transcriber.snapshot(initial_prompt)
+        if len(window) == 0:
+            return None
+        # Passes run while the key is still held, so they must not tell the
+        # widget the dictation is queued or decoding.
+        task_future = asyncio.ensure_future(run_inference(
+            model_instance, _decode_window, model_instance, window, prompt, language, task, beam_size, vad_options,
+            timings=timings, publish_for=[],
+        ))
+        return offset, len(window), task_future
+
+    pending = None
+    remainder = b""
+    received = 0
+    last_pass_at = 0
+
+    async for chunk in request.stream():
+        data = remainder + chunk
+        usable = len(data) - len(data) % dtype.itemsize
+        remainder = data[usable:]
+        if usable:
+            with timings.stage("audio_decode"):
+                samples = decode_pcm(data[:usable], sample_format)
+            transcriber.append(samples)
+            received += len(samples)
+
+        if pending is not None and pending[2].done():
+            offset, length, task_future = pending
+            pending = None
+            try:
+                transcriber.commit(offset, length, task_future.result())
+            except Exception as e:
+                print(f"Streaming pass failed: {e}")
+
+        if pending is None and model_instance is not None and received - last_pass_at >= step_samples:
+            last_pass_at = received
+            pending = start_pass()
+
+    if pending is not None:
+        offset, length, task_future = pending
+        try:
+            transcriber.commit(offset, length, await task_future)
+        except Exception as e:
+            print(f"Streaming pass failed: {e}")
+
+    # Only the tail decoded after the upload ends adds to the client's wait.
+    body_ended = time.perf_counter()
+    offset, window, prompt = transcriber.snapshot(initial_prompt)
+    if model_instance is None:
+        # language="auto" without a language for the session yet.
+        result = await _transcribe_auto(stream_request, window, timings) if len(window) > 0 else {"text": ""}
+        text = result["text"]
+    else:
+        if "language" in result:
+            _publish_request_stage(timings.request_id, "language", language=language, session=True)
+        segments = []
+        if len(window) > 0:
+            segments = await run_inference(
+                model_instance, _decode_window, model_instance, window, prompt, language, task, beam_size,
+                vad_options, timings=timings,
+            )
+        text = transcriber.finish(offset, len(window), segments)
+    timings.audio_seconds = received / SAMPLE_RATE
+    _observe_timings(timings, time.perf_counter() - body_ended)
+    return {**result, "text": text, "timings": timings.as_dict()}
+
+SERVER_PORT = 4242
+
+# Also serve HTTP on a Unix socket in the runtime directory; local clients use it
+# when present, which avoids TCP setup and loopback overhead.
+SERVER_UNIX_SOCKET = os.getenv("VIBEVOICE_UNIX_SOCKET", "true").lower() == "true"
+
+# A client attaching while the default model is failed retries loading it.
+readiness = ReadinessNotifier(retry=lambda: request_model("default"))
+
+
+class NotifyingServer(uvicorn.Server):
+    """uvicorn server that reports its sockets as bound to the readiness notifier."""
+
+    async def startup(self, sockets=None):
+        await super().startup(sockets=sockets)
+        if self.started:
+            readiness.set_bound()
+
+    async def shutdown(self, sockets=None):
+        # uvicorn waits for open connections to close, and /events streams never do.
+        events.close()
+        await super().shutdown(sockets=sockets)
+
+
+def _bind_unix_socket(path: str) -> socket.socket:
+    """Bind a Unix stream socket only this user can connect to, replacing a stale one."""
+    if os.path.exists(path):
+        # Safe because we hold the server lock: no live server owns it.
+        os.unlink(path)
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    sock.bind(path)
+    os.chmod(path, 0o600)
+    return sock
 
-    # If all temperatures failed, return empty text
-    return {"text": ""}
 
 def run_server():
-    uvicorn.run(app, host="0.0.0.0", port=4242)
+    lock = acquire_server_lock(SERVER_PORT)
+    if lock is None:
+        print("Another vibevoice server is already running; exiting.")
+        return
+
+    config = uvicorn.Config(app, host="0.0.0.0", port=SERVER_PORT)
+    tcp_socket = config.bind_socket()
+    # Accepted connections inherit this. Without it, keep-alive requests on a
+    # pre-bound socket stall ~40 ms on Nagle and delayed ACKs.
+    tcp_socket.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    sockets = [tcp_socket]
+    if SERVER_UNIX_SOCKET:
+        sockets.append(_bind_unix_socket(SERVER_SOCKET_PATH))
+
+    readiness.start()
+    try:
+        NotifyingServer(config).run(sockets=sockets)
+    finally:
+        readiness.stop()
+        if SERVER_UNIX_SOCKET and os.path.exists(SERVER_SOCKET_PATH):
+            os.unlink(SERVER_SOCKET_PATH)
+        lock.close()
 
 if __name__ == "__main__":
     run_server()
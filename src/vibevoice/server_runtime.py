@@ -0,0 +1,211 @@
+"""Discovery and readiness signalling for a shared, long-running server"""
+
+import fcntl
+import json
+import os
+import select
+import socket
+import tempfile
+import threading
+import time
+
+RUNTIME_DIR = os.getenv(
+    "VIBEVOICE_RUNTIME_DIR",
+    os.path.join(os.getenv("XDG_RUNTIME_DIR") or tempfile.gettempdir(), f"vibevoice-{os.getuid()}"),
+)
+LOCK_PATH = os.path.join(RUNTIME_DIR, "server.lock")
+READY_SOCKET_PATH = os.path.join(RUNTIME_DIR, "ready.sock")
+# Unix socket the server also serves HTTP on, so local clients skip TCP.
+SERVER_SOCKET_PATH = os.path.join(RUNTIME_DIR, "server.sock")
+# Output of a persistent server, which outlives the terminal that started it.
+SERVER_LOG_PATH = os.path.join(RUNTIME_DIR, "server.log")
+
+# File descriptor a spawning client passes to the server to be told when it is ready.
+READY_FD_ENV = "VIBEVOICE_READY_FD"
+
+
+def acquire_server_lock(port: int):
+    """Take the server lock, or return None if another server already holds it.
+
+    The lock is an flock on LOCK_PATH, so it is released automatically when
+    the server process exits, however it exits. The returned file object
+    must stay open for as long as the server runs.
+    """
+    os.makedirs(RUNTIME_DIR, mode=0o700, exist_ok=True)
+    lock_file = open(LOCK_PATH, "a+")
+    # find_running_server() briefly holds a shared lock, so retry a few times
+    # before concluding that another server owns the lock.
+    for _ in range(5):
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            break
+        except BlockingIOError:
+            time.sleep(0.05)
+    else:
+        lock_file.close()
+        return None
+
+    lock_file.seek(0)
+    lock_file.truncate()
+    json.dump({"pid": os.getpid(), "port": port}, lock_file)
+    lock_file.flush()
+    return lock_file
+
+
+def find_running_server():
+    """Return the lock contents ({"pid", "port"}) of a live server, or None."""
+    try:
+        lock_file = open(LOCK_PATH, "r")
+    except FileNotFoundError:
+        return None
+
+    with lock_file:
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_SH | fcntl.LOCK_NB)
+        except BlockingIOError:
+            # Held exclusively: a server is running.
+            try:
+                return json.loads(lock_file.read() or "{}")
+            except ValueError:
+                return {}
+        fcntl.flock(lock_file, fcntl.LOCK_UN)
+        return None
+
+
+class ReadinessNotifier:
+    """Tell waiting clients the moment the server is ready (or failed to start).
+
+    The server is ready once its HTTP socket is bound and the default model
+    is loaded. Clients that spawned the server get a line on the pipe passed
+    in VIBEVOICE_READY_FD. Clients attaching to an already-running server
+    connect to READY_SOCKET_PATH and block until a line arrives, which is
+    immediate once the outcome is known. Neither side polls.
+
+    A failure is not final: set_loading() makes clients wait again and
+    set_model_ready() still makes the server ready. `retry`, if set, is
+    called when a client attaches to a failed server, so attaching starts
+    a new load instead of failing straight away.
+    """
+
+    def __init__(self, socket_path: str = READY_SOCKET_PATH, retry=None):
+        self.socket_path = socket_path
+        self.retry = retry
+        self._lock = threading.Lock()
+        self._bound = False
+        self._model_ready = False
+        self._message = None
+        self._settled = threading.Event()
+        self._ready_fd = os.environ.pop(READY_FD_ENV, None)
+        self._listener = None
+
+    @property
+    def is_ready(self) -> bool:
+        return self._settled.is_set() and self._message == b"ready\n"
+
+    def start(self):
+        os.makedirs(os.path.dirname(self.socket_path), mode=0o700, exist_ok=True)
+        try:
+            os.unlink(self.socket_path)
+        except FileNotFoundError:
+            pass
+        self._listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self._listener.bind(self.socket_path)
+        self._listener.listen()
+        threading.Thread(target=self._accept_loop, daemon=True).start()
+
+    def _accept_loop(self):
+        while True:
+            try:
+                connection, _ = self._listener.accept()
+            except OSError:
+                return
+            threading.Thread(target=self._notify_when_settled, args=(connection,), daemon=True).start()
+
+    def _notify_when_settled(self, connection):
+        with connection:
+            if self._is_failed() and self.retry is not None:
+                self.retry()
+            self._settled.wait()
+            try:
+                connection.sendall(self._message)
+            except OSError:
+                pass
+
+    def set_bound(self):
+        """The HTTP socket is listening."""
+        with self._lock:
+            self._bound = True
+            if self._model_ready:
+                self._settle(b"ready\n")
+
+    def set_model_ready(self):
+        """The default model has finished loading."""
+        with self._lock:
+            self._model_ready = True
+            if self._bound:
+                self._settle(b"ready\n")
+
+    def set_failed(self, reason: str):
+        """The default model failed to load; waiting clients get the reason."""
+        with self._lock:
+            self._settle(f"failed: {reason}\n".encode())
+
+    def set_loading(self):
+        """The default model is loading again after a failure; clients wait for the outcome."""
+        with self._lock:
+            if self._is_failed():
+                self._message = None
+                self._settled.clear()
+
+    def _is_failed(self) -> bool:
+        message = self._message
+        return message is not None and message.startswith(b"failed")
+
+    def _settle(self, message: bytes):
+        if self._settled.is_set() and not self._is_failed():
+            return
+        self._message = message
+        self._settled.set()
+        if self._ready_fd is not None:
+            try:
+                fd = int(self._ready_fd)
+                os.write(fd, message)
+                os.close(fd)
+            except (ValueError, OSError) as e:
+                print(f"Could not signal readiness to the spawning client: {e}")
+            self._ready_fd = None
+
+    def stop(self):
+        if self._listener is not None:
+            self._listener.close()
+            self._listener = None
+        try:
+            os.unlink(self.socket_path)
+        except FileNotFoundError:
+            pass
+
+
+def _check_ready_message(message: bytes):
+    if not message:
+        raise RuntimeError("Server exited before it became ready")
+    if message.startswith(b"failed"):
+        raise RuntimeError(f"Server failed to start: {message.decode(errors='replace').strip()}")
+
+
+def wait_for_ready_fd(read_fd: int, timeout: float):
+    """Block until a spawned server writes to its readiness pipe."""
+    readable, _, _ = select.select([read_fd], [], [], timeout)
+    if not readable:
+        raise TimeoutError("Server failed to start within timeout")
+    _check_ready_message(os.read(read_fd, 4096))
+
+
+def wait_for_ready_socket(timeout: float):
+    """Block until an already-running server reports that it is ready."""
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as client:
+        client.settimeout(timeout)
+        try:
+            client.connect(READY_SOCKET_PATH)
+            _check_ready_message(client.recv(4096))
+        except socket.timeout:
+            raise TimeoutError("Server failed to become ready within timeout")
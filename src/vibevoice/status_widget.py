@@ -35,6 +35,63 @@ import os
 import sys
 import threading
 import time
+import collections
+
+from http_client import SERVER_URL, session
+
+# The server sends a keep-alive comment every 15 s, so a stream that stays
+# silent for longer belongs to a server that is gone.
+EVENTS_READ_TIMEOUT = 45
+RECONNECT_MIN_SECONDS = 1
+RECONNECT_MAX_SECONDS = 30
+
+# Key-release-to-first-keystroke latencies of this many recent dictations are plotted.
+LATENCY_HISTORY = 20
+SPARK_CHARS = "▁▂▃▄▅▆▇█"
+
+# Status line for each lifecycle stage of the dictation in progress.
+STAGE_TEXT = {
+    "recording": "Recording...",
+    "recorded": "Sending audio...",
+    "queued": "Queued...",
+    "language": "Transcribing...",
+    "decoding": "Transcribing...",
+    "transcribed": "Typing...",
+}
+
+# A stage not followed by another within this many seconds belongs to a dictation
+# whose "done" never arrived (a lost post, a CLI that exited), and is cleared.
+# Recording is exempt: it lasts as long as the key is held.
+REQUEST_STAGE_TIMEOUT = 120
+
+
+def systemd_is_active():
+    result = subprocess.run(['systemctl', '--user', 'is-active', 'vibevoice'],
+                            capture_output=True, text=True)
+    return result.stdout.strip() == 'active'
+
+
+def sparkline(values):
+    """One block character per value, scaled to the largest value."""
+    top = max(values, default=0) or 1
+    return "".join(SPARK_CHARS[min(len(SPARK_CHARS) - 1, int(value / top * len(SPARK_CHARS)))] for value in values)
+
+
+def read_events(response):
+    """Yield (event type, data) pairs from a text/event-stream response."""
+    event_type, data = "message", []
+    for line in response.iter_lines(decode_unicode=True):
+        if not line:
+            if data:
+                yield event_type, json.loads("\n".join(data))
+            event_type, data = "message", []
+        elif not line.startswith(":"):
+            field, _, value = line.partition(":")
+            value = value[1:] if value.startswith(" ") else value
+            if field == "event":
+                event_type = value
+            elif field == "data":
+                data.append(value)
 
 class VibevoiceIndicator:
     def __init__(self):
@@ -72,6 +129,10 @@ class VibevoiceIndicator:
         self.status_item = Gtk.MenuItem(label="Status: Checking...")
         self.status_item.set_sensitive(False)
         menu.append(self.status_item)
+
+        self.latency_item = Gtk.MenuItem(label="Latency: no dictations yet")
+        self.latency_item.set_sensitive(False)
+        menu.append(self.latency_item)
         
         # Separator
         separator = Gtk.SeparatorMenuItem()
@@ -130,6 +191,9 @@ class VibevoiceIndicator:
             # Status label
             self.status_label = Gtk.Label("Status: Checking...")
             vbox.pack_start(self.status_label, False, False, 0)
+
+            self.latency_label = Gtk.Label("Latency: no dictations yet")
+            vbox.pack_start(self.latency_label, False, False, 0)
             
             # Buttons
             button_box = Gtk.HBox(spacing=5)
@@ -159,53 +223,128 @@ class VibevoiceIndicator:
             self.indicator.set_menu(menu)
         
     def start_monitoring(self):
-        """Start background monitoring of service status"""
-        def monitor_loop():
-            while True:
-                GLib.idle_add(self.update_status)
-                time.sleep(5)  # Check every 5 seconds
-                
-        thread = threading.Thread(target=monitor_loop, daemon=True)
+        """Follow the server's /events stream on a background thread.
+
+        The GTK main loop only renders the state it is handed and never
+        waits on HTTP or systemctl. While the server is unreachable the
+        thread retries with a growing delay, or at once after a service
+        action from the menu.
+        """
+        self._wake = threading.Event()
+        self._latencies = collections.deque(maxlen=LATENCY_HISTORY)
+        self._stage_timer = None
+        thread = threading.Thread(target=self._follow_events, daemon=True)
         thread.start()
-        
-    def update_status(self):
-        """Update indicator status and menu based on service state"""
-        try:
-            # Check if systemd service is running
-            result = subprocess.run(['systemctl', '--user', 'is-active', 'vibevoice'], 
-                                  capture_output=True, text=True)
-            systemd_active = result.stdout.strip() == 'active'
-            
-            # Check if HTTP server is responding
-            http_active = False
-            service_info = {}
+
+    def _follow_events(self):
+        delay = RECONNECT_MIN_SECONDS
+        while True:
+            state = {"connected": False, "systemd_active": systemd_is_active(), "models": {}}
             try:
-                response = requests.get('http://localhost:4242/health', timeout=2)
-                if response.status_code == 200:
-                    http_active = True
-                    # Try to get additional service info
-                    try:
-                        info_response = requests.get('http://localhost:4242/status', timeout=1)
-                        if info_response.status_code == 200:
-                            service_info = info_response.json()
-                    except:
-                        pass
-            except requests.RequestException:
+                with session.get(f'{SERVER_URL}/events', stream=True,
+                                 timeout=(2, EVENTS_READ_TIMEOUT)) as response:
+                    response.raise_for_status()
+                    state["connected"] = True
+                    delay = RECONNECT_MIN_SECONDS
+                    for event_type, data in read_events(response):
+                        if event_type == "model":
+                            state["models"] = {**state["models"], data["slot"]: data}
+                        elif event_type == "request":
+                            self._track_request(state, data)
+                        else:
+                            state[event_type] = data
+                        state["latencies"] = list(self._latencies)
+                        GLib.idle_add(self.update_status, dict(state))
+            except (requests.RequestException, ValueError):
                 pass
-            
-            # Update status based on both checks
-            if systemd_active and http_active:
-                status_text = "Status: Running"
-                if service_info:
-                    keys_info = f" ({service_info.get('keys', {}).get('dictation', 'ctrl_r')}, {service_info.get('keys', {}).get('command', 'scroll_lock')}, {service_info.get('keys', {}).get('custom', 'num_lock')})"
-                    status_text += keys_info
+
+            # The server went away (or never answered); systemd tells stopped from starting.
+            GLib.idle_add(self.update_status, {
+                "connected": False, "systemd_active": systemd_is_active(), "latencies": list(self._latencies),
+            })
+            self._wake.wait(delay)
+            self._wake.clear()
+            delay = min(delay * 2, RECONNECT_MAX_SECONDS)
+
+    def _track_request(self, state, event):
+        """Follow the stages of the dictation the CLI started last.
+
+        Requests the CLI did not announce (the benchmark, other clients)
+        only show up in the inference counts.
+        """
+        if event["stage"] == "recording" and event.get("source") == "client":
+            state["request"] = {**event, "updated_at": time.monotonic()}
+            return
+        current = state.get("request")
+        if current is None or current["request_id"] != event["request_id"]:
+            return
+        if event["stage"] == "done":
+            if event.get("latency_ms") is not None:
+                self._latencies.append(event["latency_ms"])
+            state.pop("request")
+        else:
+            state["request"] = {**current, **event, "updated_at": time.monotonic()}
+
+    def _current_request(self, state):
+        """The dictation to show, or None once its stage has timed out.
+
+        A stage that can still time out renders the state again when it does.
+        """
+        request = state.get("request")
+        if request is None or request["stage"] == "recording":
+            return request
+        remaining = request["updated_at"] + REQUEST_STAGE_TIMEOUT - time.monotonic()
+        if remaining <= 0:
+            return None
+
+        def expire():
+            self._stage_timer = None
+            return self.update_status(state)
+
+        self._stage_timer = GLib.timeout_add_seconds(int(remaining) + 1, expire)
+        return request
+
+    def update_status(self, state):
+        """Update indicator status and menu from the latest server state"""
+        # A newer state replaces the one a pending stage timeout would render.
+        if self._stage_timer is not None:
+            GLib.source_remove(self._stage_timer)
+            self._stage_timer = None
+        try:
+            systemd_active = state["systemd_active"]
+            http_active = state["connected"]
+            server = state.get("server", {})
+            models_ready = server.get("status") == "running"
+
+            if systemd_active and http_active and models_ready:
+                keys = server.get("keys", {})
+                keys_info = f" ({keys.get('dictation', 'ctrl_r')}, {keys.get('command', 'scroll_lock')}, {keys.get('custom', 'num_lock')})"
+                inference = state.get("inference", {})
+                request = self._current_request(state)
+                if request is not None:
+                    status_text = "Status: " + STAGE_TEXT.get(request["stage"], "Working...")
+                    if request.get("audio_seconds"):
+                        status_text += f" ({request['audio_seconds']:.1f} s of audio)"
+                elif inference.get("active"):
+                    status_text = "Status: Transcribing..."
+                    if inference.get("queued"):
+                        status_text += f" ({inference['queued']} queued)"
+                else:
+                    status_text = "Status: Running" + keys_info
+                loading = [slot for slot, model in state["models"].items() if model.get("state") == "loading"]
+                if loading:
+                    status_text += f" - loading {', '.join(loading)} model"
+                if state["models"].get("default", {}).get("backend") == "cpu":
+                    status_text += " [CPU]"
                 if not self.use_window:
                     self.indicator.set_icon_full("audio-input-microphone", "Vibevoice Active")
                     self.start_item.set_sensitive(False)
                     self.stop_item.set_sensitive(True)
                     self.restart_item.set_sensitive(True)
-            elif systemd_active and not http_active:
-                status_text = "Status: Starting..."
+            elif systemd_active and not models_ready:
+                status_text = "Status: Loading model..." if http_active else "Status: Starting..."
+                if "backend_fallback" in state:
+                    status_text += f" (falling back to {state['backend_fallback']['to'].upper()})"
                 if not self.use_window:
                     self.indicator.set_icon_full("audio-input-microphone-muted", "Vibevoice Starting")
                     self.start_item.set_sensitive(False)
@@ -219,10 +358,17 @@ class VibevoiceIndicator:
                     self.stop_item.set_sensitive(False)
                     self.restart_item.set_sensitive(False)
                 
+            latencies = state.get("latencies", [])
+            latency_text = (f"Latency: {sparkline(latencies)} last {latencies[-1]} ms"
+                            if latencies else "Latency: no dictations yet")
+
             if self.use_window:
                 self.status_label.set_text(status_text)
+                self.latency_label.set_text(latency_text)
             else:
                 self.status_item.set_label(status_text)
+                self.latency_item.set_label(latency_text)
+                self.indicator.set_label(sparkline(latencies), "")
             
         except Exception as e:
             print(f"Error updating status: {e}")
@@ -240,6 +386,7 @@ class VibevoiceIndicator:
         try:
             subprocess.run(['systemctl', '--user', 'start', 'vibevoice'], check=True)
             self.show_notification("Starting Vibevoice service...")
+            self._wake.set()
         except subprocess.CalledProcessError as e:
             self.show_error_dialog(f"Failed to start service: {e}")
             
@@ -248,6 +395,7 @@ class VibevoiceIndicator:
         try:
             subprocess.run(['systemctl', '--user', 'stop', 'vibevoice'], check=True)
             self.show_notification("Stopping Vibevoice service...")
+            self._wake.set()
         except subprocess.CalledProcessError as e:
             self.show_error_dialog(f"Failed to stop service: {e}")
             
@@ -256,6 +404,7 @@ class VibevoiceIndicator:
         try:
             subprocess.run(['systemctl', '--user', 'restart', 'vibevoice'], check=True)
             self.show_notification("Restarting Vibevoice service...")
+            self._wake.set()
         except subprocess.CalledProcessError as e:
             self.show_error_dialog(f"Failed to restart service: {e}")
             
@@ -269,7 +418,7 @@ class VibevoiceIndicator:
             # Try to get service info from HTTP
             service_info = {}
             try:
-                response = requests.get('http://localhost:4242/status', timeout=2)
+                response = session.get(f'{SERVER_URL}/status', timeout=2)
                 if response.status_code == 200:
                     service_info = response.json()
             except:
@@ -378,12 +527,9 @@ def main():
         print("Please install: sudo apt install python3-gi python3-gi-cairo gir1.2-gtk-3.0")
         sys.exit(1)
     
-    # Create and run indicator
+    # Create and run indicator; its event thread reports the status right away
     indicator = VibevoiceIndicator()
     
-    # Update status immediately
-    GLib.idle_add(indicator.update_status)
-    
     print("Vibevoice status indicator started")
     
     try:
@@ -0,0 +1,103 @@
+"""Incremental transcription of audio that is still being recorded"""
+
+import numpy as np
+
+SAMPLE_RATE = 16000
+
+
+def _normalize(text: str) -> str:
+    return " ".join(text.lower().split())
+
+
+class StreamingTranscriber:
+    """Transcribe a growing audio buffer and commit stabilized prefixes.
+
+    Every pass decodes the audio after the last committed point. A segment is
+    committed once two consecutive passes agree on it and it ends far enough
+    before the end of the buffer that new audio can no longer change it
+    (LocalAgreement-2). Committed audio is dropped from later passes, so the
+    work left after the key is released is only the short uncommitted tail.
+    """
+
+    def __init__(self, holdback_seconds=1.0, max_window_seconds=25.0):
+        self.holdback_samples = int(holdback_seconds * SAMPLE_RATE)
+        self.max_window_samples = int(max_window_seconds * SAMPLE_RATE)
+        self._audio = np.zeros(SAMPLE_RATE * 30, dtype=np.float32)
+        self._length = 0
+        self._committed_samples = 0
+        self._committed_text = []
+        self._previous = []
+
+    @property
+    def pending_samples(self) -> int:
+        return self._length - self._committed_samples
+
+    @property
+    def text(self) -> str:
+        return " ".join(self._committed_text)
+
+    def append(self, samples: np.ndarray):
+        """Append float32 mono samples to the buffer."""
+        needed = self._length + len(samples)
+        if needed > len(self._audio):
+            grown = np.zeros(max(needed, len(self._audio) * 2), dtype=np.float32)
+            grown[:self._length] = self._audio[:self._length]
+            self._audio = grown
+        self._audio[self._length:needed] = samples
+        self._length = needed
+
+    def snapshot(self, initial_prompt=None):
+        """Return (offset, window, prompt) for the next decode pass.
+
+        The window is a copy, so the decode can run on another thread while
+        new audio keeps arriving.
+        """
+        offset = self._committed_samples
+        window = self._audio[offset:self._length].copy()
+        context = self.text[-200:]
+        if initial_prompt and context:
+            prompt = f"{initial_prompt} {context}"
+        else:
+            prompt = initial_prompt or context or None
+        return offset, window, prompt
+
+    def finish(self, offset, window_length, segments) -> str:
+        """Commit every segment of the final pass and return the transcript."""
+        for _, _, text in segments:
+            if text.strip():
+                self._committed_text.append(text.strip())
+        self._committed_samples = offset + window_length
+        self._previous = []
+        return self.text
+
+    def commit(self, offset, window_length, segments):
+        """Commit the agreed prefix of a pass over snapshot(offset, window)."""
+        stable_limit = window_length - self.holdback_samples
+        force = window_length >= self.max_window_samples
+        committed_end = None
+        agreed = 0
+
+        for index, (start, end, text) in enumerate(segments):
+            end_sample = int(end * SAMPLE_RATE)
+            is_last = index == len(segments) - 1
+            matches_previous = (
+                index < len(self._previous)
+                and _normalize(self._previous[index][2]) == _normalize(text)
+            )
+            # Never force-commit the last segment; it may still be cut mid-word.
+            if end_sample <= stable_limit and (matches_previous or (force and not is_last)):
+                if text.strip():
+                    self._committed_text.append(text.strip())
+                committed_end = end_sample
+                agreed = index + 1
+            else:
+                break
+
+        if committed_end is not None:
+            self._committed_samples = offset + min(committed_end, window_length)
+            shift = committed_end / SAMPLE_RATE
+            self._previous = [
+                (start - shift, end - shift, text) for start, end, text in segments[agreed:]
+            ]
+        else:
+            self._previous = segments[agreed:]
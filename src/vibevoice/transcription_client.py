@@ -0,0 +1,341 @@
+"""HTTP client for the transcription server, shared by the CLI and the benchmark"""
+
+import json
+import os
+import queue
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import requests
+from scipy.io import wavfile
+
+from audio_buffer import BufferReader
+from audio_trim import LeadingSilenceGate, trim_silence
+from http_client import SERVER_URL, session
+
+SAMPLE_RATE = 16000
+
+# With AUTO_LANGUAGE=true both dictation keys send language="auto" and the server
+# picks English or Swedish, so hitting the wrong key no longer means re-recording.
+# The detected language is kept for this CLI session (see WHISPER_AUTO_SESSION_SECONDS).
+AUTO_LANGUAGE = os.getenv('AUTO_LANGUAGE', 'false').lower() == 'true'
+SESSION_ID = uuid.uuid4().hex[:12]
+
+
+class RequestTrace:
+    """Client-side latency of one recording, logged under the ID sent to the server.
+
+    The server logs its stage timings under the same X-Request-ID, so the
+    two log lines can be matched up. With publish=True the CLI's stages
+    (recording, recorded, done) also go to the server's /events stream,
+    next to the server's own stages for the request.
+    """
+
+    def __init__(self, publish=False):
+        self.request_id = uuid.uuid4().hex[:12]
+        self.started_at = time.perf_counter()
+        self.released_at = None
+        self.transcribed_at = None
+        self.latency_ms = None
+        self._publish_stages = publish
+        self._typed = False
+        self._publish("recording")
+
+    def headers(self):
+        return {'X-Request-ID': self.request_id}
+
+    def release(self, audio_seconds=None):
+        self.released_at = time.perf_counter()
+        self._publish("recorded", audio_seconds=audio_seconds,
+                      recording_ms=round((self.released_at - self.started_at) * 1000))
+
+    def transcribed(self):
+        """Mark the raw transcript as ready when it is post-processed before typing."""
+        self.transcribed_at = time.perf_counter()
+
+    def _transcript_ms(self):
+        if self.transcribed_at is None or self.released_at is None:
+            return None
+        return (self.transcribed_at - self.released_at) * 1000
+
+    def first_keystroke(self):
+        """Log key-release-to-first-keystroke latency, once per recording.
+
+        For post-processed text, the part raw dictation would have taken
+        (until the transcript was ready) is logged next to it.
+        """
+        if self._typed or self.released_at is None:
+            return
+        self._typed = True
+        self.latency_ms = (time.perf_counter() - self.released_at) * 1000
+        transcript_ms = self._transcript_ms()
+        detail = ""
+        if transcript_ms is not None:
+            detail = (f" ({transcript_ms:.0f} ms to the raw transcript, "
+                      f"+{self.latency_ms - transcript_ms:.0f} ms post-processing)")
+        print(f"[{self.request_id}] Key release to first keystroke: {self.latency_ms:.0f} ms{detail}")
+
+    def finish(self):
+        """Publish the end of the request, typed or not."""
+        total_ms = (time.perf_counter() - self.released_at) * 1000 if self.released_at is not None else None
+        transcript_ms = self._transcript_ms()
+        self._publish("done", typed=self._typed,
+                      latency_ms=round(self.latency_ms) if self.latency_ms is not None else None,
+                      transcript_ms=round(transcript_ms) if transcript_ms is not None else None,
+                      total_ms=round(total_ms) if total_ms is not None else None)
+
+    def _publish(self, stage, **data):
+        if self._publish_stages:
+            lifecycle_events.submit(_post_lifecycle_event, {'request_id': self.request_id, 'stage': stage, **data})
+
+
+# Lifecycle events are posted in order on one background thread, off the latency path.
+lifecycle_events = ThreadPoolExecutor(max_workers=1, thread_name_prefix="lifecycle")
+_event_subscribers = 0
+
+
+def _post_lifecycle_event(event):
+    global _event_subscribers
+    try:
+        response = session.post(f'{SERVER_URL}/events/request', json=event, timeout=2)
+        response.raise_for_status()
+        _event_subscribers = response.json().get('subscribers', 0)
+    except (requests.exceptions.RequestException, ValueError):
+        pass
+
+
+def status_widget_listening():
+    """Whether anything (normally the status widget) followed /events at the last lifecycle event."""
+    return _event_subscribers > 0
+
+
+class TranscriptionStream:
+    """Upload microphone frames to /transcribe/stream while the key is held.
+
+    Unless TRIM_SILENCE=false, frames before the first speech are held back
+    and only the last 200 ms of that silence is sent. Trailing silence and
+    long pauses are only known after the upload; the server's VAD skips them.
+    """
+
+    def __init__(self, params, trace):
+        self._gate = LeadingSilenceGate(SAMPLE_RATE) if _trim_enabled() else None
+        self._frames = queue.Queue()
+        self._text = None
+        self._error = None
+        self._trace = trace
+        self._thread = threading.Thread(target=self._run, args=(params,), daemon=True)
+        self._thread.start()
+
+    def write(self, indata):
+        """Queue one float32 block from the sounddevice callback."""
+        if self._gate is not None:
+            indata = self._gate.feed(indata)
+            if len(indata) == 0:
+                return
+        self._frames.put(indata.tobytes())
+
+    def _body(self):
+        while True:
+            frame = self._frames.get()
+            if frame is None:
+                return
+            yield frame
+
+    def _run(self, params):
+        try:
+            response = session.post(f'{SERVER_URL}/transcribe/stream',
+                                    params=params,
+                                    data=self._body(),
+                                    headers={'Content-Type': 'application/octet-stream',
+                                             **self._trace.headers()})
+            response.raise_for_status()
+            self._text = response.json()['text']
+        except requests.exceptions.RequestException as e:
+            self._error = e
+
+    def finish(self):
+        """End the upload and return the final transcript.
+
+        Returns None when no speech was found to stream, so the recording
+        can be checked as a whole.
+        """
+        self._frames.put(None)
+        if self._gate is not None and self._gate.removed_samples:
+            print(f"Held back {self._gate.removed_seconds:.2f}s of leading silence from the stream")
+        self._thread.join()
+        if self._error is not None:
+            raise self._error
+        if self._gate is not None and not self._gate.open:
+            return None
+        return self._text
+
+
+def query_params(params):
+    """Request parameters as a query string.
+
+    vad_parameters become vad_<name> keys and initial_prompts
+    initial_prompt_<language> keys.
+    """
+    query = {key: value for key, value in params.items() if not isinstance(value, dict)}
+    for name, value in (params.get('vad_parameters') or {}).items():
+        query[f'vad_{name}'] = value
+    for language, prompt in (params.get('initial_prompts') or {}).items():
+        query[f'initial_prompt_{language}'] = prompt
+    return query
+
+
+def request_transcript(params, audio, stream=None, trace=None, on_segment=None):
+    """Return the transcript, preferring the live stream over the recording.
+
+    Leading/trailing silence and long pauses are trimmed before upload
+    unless TRIM_SILENCE=false. The recording is sent as raw float32 PCM by
+    default. Set AUDIO_TRANSPORT=file to go through recording.wav instead.
+    on_segment is passed to send_recording; the live stream never calls it.
+    """
+    if stream is not None:
+        try:
+            text = stream.finish()
+            if text is not None:
+                return text
+            print("No speech was streamed; sending the recording instead")
+        except requests.exceptions.RequestException as e:
+            print(f"Streaming transcription failed ({e}); sending the recording instead")
+
+    result = send_recording(params, audio, trace, on_segment)
+    return result['text'] if result is not None else ""
+
+
+def _trim_enabled():
+    return os.getenv('TRIM_SILENCE', 'true').lower() == 'true'
+
+
+def trim_recording(audio):
+    """Trim silence unless TRIM_SILENCE=false; returns None if no speech is left."""
+    if not _trim_enabled():
+        return audio
+    audio, trim_stats = trim_silence(audio, SAMPLE_RATE)
+    print(f"Trimmed {trim_stats['removed_seconds']:.2f}s of "
+          f"{trim_stats['original_seconds']:.2f}s as silence")
+    if len(audio) == 0:
+        print("No speech detected; nothing to transcribe")
+        return None
+    return audio
+
+
+def send_recording(params, audio, trace=None, on_segment=None):
+    """Upload a finished recording and return the server's JSON response.
+
+    With on_segment, the server streams segments as they are decoded and
+    on_segment(text) is called for each one before the response is
+    returned. Returns None without a request when trimming leaves no speech.
+    """
+    audio = trim_recording(audio)
+    if audio is None:
+        return None
+
+    headers = trace.headers() if trace is not None else {}
+    if on_segment is not None:
+        headers['Accept'] = 'application/x-ndjson'
+    if os.getenv('AUDIO_TRANSPORT', 'pcm').lower() == 'file':
+        recording_path = os.path.abspath('recording.wav')
+        audio_data_int16 = (audio * np.iinfo(np.int16).max).astype(np.int16)
+        wavfile.write(recording_path, SAMPLE_RATE, audio_data_int16)
+        response = session.post(f'{SERVER_URL}/transcribe/',
+                                json={'file_path': recording_path, **params},
+                                headers=headers, stream=on_segment is not None)
+    else:
+        response = session.post(f'{SERVER_URL}/transcribe/pcm',
+                                params={'sample_format': 'f32le', **query_params(params)},
+                                data=BufferReader(audio),
+                                headers={'Content-Type': 'application/octet-stream', **headers},
+                                stream=on_segment is not None)
+    response.raise_for_status()
+    if not response.headers.get('Content-Type', '').startswith('application/x-ndjson'):
+        return response.json()
+    return read_segments(response, on_segment)
+
+
+def read_segments(response, on_segment):
+    """Call on_segment with each streamed segment's text and return the final result."""
+    for line in response.iter_lines():
+        if not line:
+            continue
+        message = json.loads(line)
+        if message['type'] == 'segment':
+            if message['text']:
+                on_segment(message['text'])
+        elif message['type'] == 'error':
+            raise requests.exceptions.HTTPError(f"{message['status']} error from the server: {message['detail']}",
+                                                response=response)
+        else:
+            return message
+    raise requests.exceptions.ChunkedEncodingError("Segment stream ended without a result")
+
+
+def _auto_language(params):
+    """With AUTO_LANGUAGE=true, let the server choose between English and Swedish."""
+    if not AUTO_LANGUAGE:
+        return params
+    english, swedish = _english_params(), _swedish_params()
+    return {
+        **params,
+        'language': 'auto',
+        'initial_prompts': {english['language']: english['initial_prompt'],
+                            swedish['language']: swedish['initial_prompt']},
+        'session_id': SESSION_ID,
+    }
+
+
+def swedish_params():
+    """Transcription request parameters for the Swedish key."""
+    return _auto_language(_swedish_params())
+
+
+def english_params():
+    """Transcription request parameters for the English key."""
+    return _auto_language(_english_params())
+
+
+def _swedish_params():
+    """Transcription request parameters for Swedish with software development context."""
+    # Get configurable parameters from environment
+    swedish_language = os.getenv('SWEDISH_LANGUAGE', 'sv')
+    swedish_prompt = os.getenv('SWEDISH_PROMPT',
+        'Det här är en intervju om mjukvaruutveckling och SaaS med svenska termer. Å, Ä, Ö ska användas. Termer: API, databas, skalbarhet, deployment, commit, branch, merge, pull request, issue, sprint, backlog, scrum, kanban, devops, CI/CD, docker, kubernetes, microservices, serverless, cloud, azure, aws.')
+
+    # Swedish language and advanced decoding parameters
+    return {
+        'language': swedish_language,
+        'task': 'transcribe',
+        'initial_prompt': swedish_prompt,
+        'beam_size': 5,
+        'best_of': 1,
+        'temperature': 0,
+        'vad_filter': True,
+        'vad_parameters': { 'min_silence_duration_ms': 200, 'speech_pad_ms': 120 },
+        'log_prob_threshold': -1.0
+    }
+
+
+def _english_params():
+    """Transcription request parameters for English with software development context."""
+    # Get configurable parameters from environment
+    english_language = os.getenv('ENGLISH_LANGUAGE', 'en')
+    english_prompt = os.getenv('ENGLISH_PROMPT',
+        'This is a technical discussion about software development, SaaS, and startups. Technical terms include programming, APIs, databases, cloud services, scalability, deployment, commit, branch, merge, pull request, issue, sprint, backlog, scrum, kanban, devops, CI/CD, docker, kubernetes, microservices, serverless.')
+
+    # English language and advanced decoding parameters
+    return {
+        'language': english_language,
+        'task': 'transcribe',
+        'initial_prompt': english_prompt,
+        'beam_size': 5,
+        'best_of': 1,
+        'temperature': 0,
+        'vad_filter': True,
+        'vad_parameters': { 'min_silence_duration_ms': 200, 'speech_pad_ms': 120 },
+        'log_prob_threshold': -1.0
+    }
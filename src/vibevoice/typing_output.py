@@ -0,0 +1,160 @@
+"""Keyboard output: bulk typing, clipboard paste and a queue for streamed text"""
+
+import os
+import platform
+import queue
+import shutil
+import subprocess
+import threading
+import time
+
+from pynput.keyboard import Key
+
+# "type" sends keystrokes, "paste" puts every block on the clipboard and sends the
+# paste shortcut, "auto" pastes blocks that would take too long to type at the
+# rate measured for the target application so far.
+TYPING_MODE = os.getenv('TYPING_MODE', 'type').lower()
+TYPING_PASTE_AFTER_MS = float(os.getenv('TYPING_PASTE_AFTER_MS', '400'))
+TYPING_PASTE_KEYS = os.getenv('TYPING_PASTE_KEYS', 'cmd+v' if platform.system() == 'Darwin' else 'ctrl+v')
+
+
+def _clipboard_command():
+    """argv of a tool that copies stdin to the clipboard, or None if there is none."""
+    if platform.system() == 'Darwin':
+        return ['pbcopy']
+    if os.getenv('WAYLAND_DISPLAY') and shutil.which('wl-copy'):
+        return ['wl-copy']
+    if shutil.which('xclip'):
+        return ['xclip', '-selection', 'clipboard']
+    if shutil.which('xsel'):
+        return ['xsel', '--clipboard', '--input']
+    return None
+
+
+def _parse_keys(combo: str):
+    """'ctrl+shift+v' -> [Key.ctrl, Key.shift, 'v']"""
+    return [Key[name] if len(name) > 1 else name for name in combo.lower().split('+')]
+
+
+class KeyboardOutput:
+    """Inject text at the cursor, typing or pasting each block.
+
+    Keeps the typing rate of the target application (characters per second
+    of keystroke injection), which the "auto" mode uses to decide when a
+    block is faster to paste.
+    """
+
+    def __init__(self, controller):
+        self.controller = controller
+        self.mode = TYPING_MODE if TYPING_MODE in ('type', 'paste', 'auto') else 'type'
+        self.paste_keys = _parse_keys(TYPING_PASTE_KEYS)
+        self._clipboard = _clipboard_command() if self.mode != 'type' else None
+        if self.mode != 'type' and self._clipboard is None:
+            print(f"TYPING_MODE={self.mode} needs wl-copy, xclip or xsel; typing instead")
+        self._typed_chars = 0
+        self._typing_seconds = 0.0
+
+    def typing_rate(self):
+        """Measured keystroke injection rate in characters per second, or None."""
+        if self._typing_seconds <= 0:
+            return None
+        return self._typed_chars / self._typing_seconds
+
+    def _should_paste(self, text: str) -> bool:
+        if self._clipboard is None:
+            return False
+        if self.mode == 'paste':
+            return True
+        rate = self.typing_rate()
+        return rate is not None and len(text) / rate * 1000 >= TYPING_PASTE_AFTER_MS
+
+    def _paste(self, text: str):
+        subprocess.run(self._clipboard, input=text.encode('utf-8'), check=True, timeout=2)
+        *modifiers, key = self.paste_keys
+        with self.controller.pressed(*modifiers):
+            self.controller.tap(key)
+
+    def inject(self, text: str) -> str:
+        """Type or paste `text`; returns "typed" or "pasted"."""
+        if self._should_paste(text):
+            try:
+                self._paste(text)
+                return 'pasted'
+            except (OSError, subprocess.SubprocessError) as e:
+                print(f"Clipboard paste failed, typing instead: {e}")
+        started = time.perf_counter()
+        self.controller.type(text)
+        self._typing_seconds += time.perf_counter() - started
+        self._typed_chars += len(text)
+        return 'typed'
+
+
+class TypingWorker:
+    """Inject streamed text from a background thread.
+
+    The reader only queues chunks. Everything that arrived while the
+    previous block was being injected is joined and injected in one go,
+    so a slow target application never stalls the network stream.
+    """
+
+    def __init__(self, output: KeyboardOutput, on_first_output=None):
+        self.output = output
+        self.on_first_output = on_first_output
+        self._queue = queue.Queue()
+        self._started = time.perf_counter()
+        self._chars = 0
+        self._blocks = 0
+        self._pasted = 0
+        self._inject_seconds = 0.0
+        self._thread = threading.Thread(target=self._run, name="typing", daemon=True)
+        self._thread.start()
+
+    def write(self, text: str):
+        if text:
+            self._queue.put(text)
+
+    def close(self):
+        """Wait until all queued text is injected, log throughput and return it."""
+        closed = time.perf_counter()
+        self._queue.put(None)
+        self._thread.join()
+        finished = time.perf_counter()
+        stats = {
+            "chars": self._chars,
+            "blocks": self._blocks,
+            "pasted_blocks": self._pasted,
+            "chars_per_second": round(self._chars / self._inject_seconds, 1) if self._inject_seconds else None,
+            "typing_rate": round(self.output.typing_rate(), 1) if self.output.typing_rate() else None,
+            "drain_ms": round((finished - closed) * 1000, 1),
+        }
+        if self._chars:
+            print(f"Typed {stats['chars']} chars in {stats['blocks']} blocks ({stats['pasted_blocks']} pasted), "
+                  f"{stats['chars_per_second']} chars/s ({stats['typing_rate']} chars/s when typing), "
+                  f"{stats['drain_ms']:.0f} ms after the stream ended, {finished - self._started:.1f} s total")
+        return stats
+
+    def _run(self):
+        done = False
+        while not done:
+            chunks = [self._queue.get()]
+            while True:
+                try:
+                    chunks.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            done = None in chunks
+            text = ''.join(chunk for chunk in chunks if chunk is not None)
+            if not text:
+                continue
+            if self._blocks == 0 and self.on_first_output is not None:
+                self.on_first_output()
+            started = time.perf_counter()
+            try:
+                if self.output.inject(text) == 'pasted':
+                    self._pasted += 1
+            except Exception as e:
+                print(f"Error typing output: {e}")
+                continue
+            self._inject_seconds += time.perf_counter() - started
+            self._chars += len(text)
+            self._blocks += 1
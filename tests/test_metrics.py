@@ -0,0 +1,54 @@
+import pytest
+
+from metrics import Histogram, PrometheusText
+
+parser = pytest.importorskip("prometheus_client.parser")
+
+
+def _families(metrics: PrometheusText) -> dict:
+    return {family.name: family for family in parser.text_string_to_metric_families(metrics.render())}
+
+
+def test_counter_round_trips_as_typed_counter():
+    metrics = PrometheusText()
+    metrics.counter("vibevoice_fallback_segments", "Segments by temperature", 3, temperature="0.0")
+    metrics.counter("vibevoice_fallback_segments", "Segments by temperature", 1, temperature="0.2")
+
+    family = _families(metrics)["vibevoice_fallback_segments"]
+
+    assert family.type == "counter"
+    assert family.documentation == "Segments by temperature"
+    assert [(sample.name, sample.labels, sample.value) for sample in family.samples] == [
+        ("vibevoice_fallback_segments_total", {"temperature": "0.0"}, 3),
+        ("vibevoice_fallback_segments_total", {"temperature": "0.2"}, 1),
+    ]
+
+
+def test_gauge_and_histogram_round_trip():
+    histogram = Histogram((0.1, 1.0))
+    histogram.observe(0.05)
+    histogram.observe(0.5)
+    metrics = PrometheusText()
+    metrics.gauge("vibevoice_ready", "1 once the default model is loaded", 1)
+    metrics.histogram("vibevoice_request_duration_seconds", "Request latency", histogram.snapshot(),
+                      endpoint="/transcribe/")
+
+    families = _families(metrics)
+
+    assert families["vibevoice_ready"].type == "gauge"
+    assert families["vibevoice_ready"].samples[0].value == 1
+    latency = families["vibevoice_request_duration_seconds"]
+    assert latency.type == "histogram"
+    samples = {(sample.name, sample.labels.get("le")): sample.value for sample in latency.samples}
+    assert samples[("vibevoice_request_duration_seconds_bucket", "0.1")] == 1
+    assert samples[("vibevoice_request_duration_seconds_bucket", "+Inf")] == 2
+    assert samples[("vibevoice_request_duration_seconds_count", None)] == 2
+
+
+def test_label_values_are_escaped():
+    metrics = PrometheusText()
+    metrics.gauge("vibevoice_model_loaded", "Models currently loaded", 1, model='say "hi"\\')
+
+    sample = _families(metrics)["vibevoice_model_loaded"].samples[0]
+
+    assert sample.labels == {"model": 'say "hi"\\'}